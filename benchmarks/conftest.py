@@ -0,0 +1,66 @@
+import logging
+import argparse
+
+import pytest
+from cldfbench.datadir import DataDir
+
+from multicastpy.synthetic import make_repos
+from multicastpy.dataset import Dataset
+
+
+def pytest_addoption(parser):
+    parser.addoption('--texts', type=int, default=20, help='number of texts in the corpus')
+    parser.addoption('--units', type=int, default=100, help='number of units per text')
+
+
+@pytest.fixture(scope='session')
+def repos(request, tmp_path_factory):
+    return make_repos(
+        tmp_path_factory.mktemp('repos'),
+        texts=request.config.getoption('texts'),
+        units=request.config.getoption('units'))
+
+
+@pytest.fixture(scope='session')
+def corpus_dir(repos):
+    return repos / 'data' / '2401' / 'synth'
+
+
+@pytest.fixture(scope='session')
+def dataset_dir(repos, tmp_path_factory):
+    from multicastpy.__main__ import main
+
+    target = tmp_path_factory.mktemp('dataset') / 'mcsynth'
+    target.mkdir()
+    main([
+        'cldfbench',
+        '--corpus', 'synth',
+        '--version', '2401',
+        '--target-repos', str(target),
+        str(repos)], log=logging.getLogger(__name__))
+    return target
+
+
+@pytest.fixture
+def dataset(dataset_dir):
+    """
+    A factory for `Dataset` instances - since a `Dataset` caches data derived from the raw data.
+    """
+    def factory():
+        ds = Dataset()
+        ds.id = 'mcsynth'
+        ds.dir = DataDir(dataset_dir)
+        return ds
+    return factory
+
+
+@pytest.fixture
+def makecldf_args():
+    glang = argparse.Namespace(
+        id='vera1241',
+        macroareas=[argparse.Namespace(name='Papunesia')],
+        latitude=1,
+        longitude=2)
+    return dict(
+        log=logging.getLogger(__name__),
+        glottolog=argparse.Namespace(api=argparse.Namespace(languoid=lambda gc: glang)))
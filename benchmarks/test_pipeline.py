@@ -0,0 +1,84 @@
+"""
+Benchmarks for the steps of building the CLDF data of a corpus, run on a synthetic corpus.
+
+Run with
+
+    pytest --no-cov benchmarks --benchmark-autosave [--texts N] [--units M]
+
+and compare with earlier runs via `--benchmark-compare`.
+"""
+import shutil
+import argparse
+
+import pytest
+from lxml.etree import parse
+from cldfbench import CLDFWriter
+
+from multicastpy.xml import get_file, Unit
+from multicastpy.eaf import add_orthography
+from multicastpy.refind import refind_map, iter_referents, remap_refind
+from multicastpy.repos import MultiCast
+from multicastpy.tex import iter_text_metadata
+
+
+@pytest.fixture(scope='module')
+def rmap(corpus_dir):
+    return refind_map(corpus_dir / 'tsv')
+
+
+def test_get_file(benchmark, corpus_dir):
+    benchmark(lambda: list(get_file(corpus_dir / 'xml' / 'mc_synth_text1.xml')))
+
+
+def test_Unit(benchmark, corpus_dir):
+    units = parse(str(corpus_dir / 'xml' / 'mc_synth_text1.xml')).xpath('.//unit')
+    benchmark(lambda: [Unit(e) for e in units])
+
+
+def test_refind_map(benchmark, corpus_dir):
+    benchmark(refind_map, corpus_dir / 'tsv')
+
+
+def test_iter_referents(benchmark, repos, rmap):
+    p = repos.joinpath(
+        'data', 'docs', 'corpora', 'list-of-referents', 'synth', 'tsv',
+        'mc_synth_list-of-referents.tsv')
+    benchmark(lambda: list(iter_referents(p, rmap)))
+
+
+@pytest.mark.parametrize('suffix', ['xml', 'eaf', 'tsv'])
+def test_remap_refind(benchmark, corpus_dir, rmap, tmp_path, suffix):
+    src = corpus_dir / suffix / 'mc_synth_text1.{}'.format(suffix)
+
+    def setup():
+        shutil.copyfile(src, tmp_path / src.name)
+        return (tmp_path / src.name, rmap), {}
+
+    benchmark.pedantic(remap_refind, setup=setup, rounds=10)
+
+
+def test_add_orthography(benchmark, corpus_dir):
+    benchmark(add_orthography, corpus_dir / 'eaf' / 'mc_synth_text1.eaf')
+
+
+def test_iter_text_metadata(benchmark, repos):
+    mc = MultiCast(repos)
+    tsv = list(mc.text_metadata('2401'))
+    benchmark(lambda: list(iter_text_metadata(mc.corpora_tex, tsv, 'synth', {})))
+
+
+@pytest.mark.parametrize('options', [{}, {'incremental': 1}], ids=['full', 'incremental'])
+def test_makecldf(benchmark, dataset, makecldf_args, options):
+    def setup():
+        ds = dataset()
+        if not options:  # A full build does not profit from cached data.
+            shutil.rmtree(ds.cache_dir, ignore_errors=True)
+        return (ds,), {}
+
+    def makecldf(ds):
+        with CLDFWriter(cldf_spec=ds.cldf_specs()) as writer:
+            ds.cmd_makecldf(argparse.Namespace(writer=writer, **options, **makecldf_args))
+
+    if options:  # Populate the cache.
+        makecldf(dataset())
+    benchmark.pedantic(makecldf, setup=setup, rounds=3)
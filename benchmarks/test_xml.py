@@ -0,0 +1,49 @@
+"""
+Benchmarks for reading Multi-CAST XML, on a text with many units.
+"""
+import collections
+
+import pytest
+from lxml.etree import parse
+
+from multicastpy.synthetic import make_repos
+from multicastpy.xml import UNMARKED, parse_tiers, Unit
+
+
+def parse_tiers_xpath(unit):
+    """
+    The original implementation of `parse_tiers`, evaluating one XPath expression per tier and
+    segment - for comparison.
+    """
+    tiers = collections.defaultdict(list)
+    for segment in unit.xpath('annotations/segment'):
+        for name in 'gword gloss graid refind isnref'.split():
+            e = segment.xpath(name)
+            tiers[name].append((e[0].text or UNMARKED) if e else UNMARKED)
+    return tiers
+
+
+@pytest.fixture(scope='module')
+def units(tmp_path_factory):
+    repos = make_repos(tmp_path_factory.mktemp('large'), texts=1, units=5000, audio=False)
+    return parse(str(repos / 'data' / '2401' / 'synth' / 'xml' / 'mc_synth_text1.xml')).xpath(
+        './/unit')
+
+
+@pytest.mark.benchmark(group='parse_tiers')
+@pytest.mark.parametrize('func', [parse_tiers, parse_tiers_xpath], ids=['single-pass', 'xpath'])
+def test_parse_tiers(benchmark, units, func):
+    res = benchmark.pedantic(lambda: [func(u) for u in units], rounds=3)
+    assert [dict(r) for r in res] == [parse_tiers(u) for u in units]
+
+
+@pytest.mark.benchmark(group='conformance')
+@pytest.mark.parametrize(
+    'func',
+    [lambda u: u.conformance, lambda u: u.igt.conformance],
+    ids=['fast', 'pyigt'])
+def test_conformance(benchmark, units, func):
+    def setup():  # Units cache their IGT, so we need fresh ones for each round.
+        return ([Unit(e) for e in units],), {}
+
+    benchmark.pedantic(lambda us: [func(u) for u in us], setup=setup, rounds=3)
@@ -0,0 +1,257 @@
+"""
+Functionality to handle the audio recordings of a corpus.
+"""
+import os
+import mmap
+import wave
+import struct
+import contextlib
+import collections
+import concurrent.futures
+
+from .util import FileCache
+
+__all__ = ['audio_duration', 'mp3_duration', 'DurationCache', 'WavFile', 'WavCache']
+
+AUDIO_SUFFIXES = ['.mp3', '.wav']
+
+# MPEG audio frame header lookup tables, indexed by (version, layer), with version 1 for MPEG-1
+# and 2 for MPEG-2 and MPEG-2.5.
+BITRATES = {  # kbit/s
+    (1, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (1, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (1, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (2, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (2, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (2, 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+SAMPLE_RATES = {  # keyed by the version bits of the header
+    0b11: [44100, 48000, 32000],  # MPEG-1
+    0b10: [22050, 24000, 16000],  # MPEG-2
+    0b00: [11025, 12000, 8000],  # MPEG-2.5
+}
+
+
+def parse_frame_header(b):
+    """
+    Parse a 4-byte MPEG audio frame header.
+
+    :return: `(samples per frame, sample rate, frame length in bytes, side info length)` or \
+    `None` if `b` is not a valid header.
+    """
+    h = struct.unpack('>I', b)[0]
+    if (h >> 21) != 0x7FF:
+        return None
+    version_bits, layer_bits = (h >> 19) & 3, (h >> 17) & 3
+    bitrate_index, sr_index = (h >> 12) & 15, (h >> 10) & 3
+    if version_bits == 1 or layer_bits == 0 or bitrate_index in (0, 15) or sr_index == 3:
+        return None
+    version, layer = 1 if version_bits == 3 else 2, 4 - layer_bits
+    bitrate = BITRATES[version, layer][bitrate_index] * 1000
+    sample_rate = SAMPLE_RATES[version_bits][sr_index]
+    padding, mono = (h >> 9) & 1, ((h >> 6) & 3) == 3
+    if layer == 1:
+        samples, length = 384, (12 * bitrate // sample_rate + padding) * 4
+    else:
+        samples = 576 if (layer == 3 and version == 2) else 1152
+        length = samples // 8 * bitrate // sample_rate + padding
+    if version == 1:
+        side_info = 17 if mono else 32
+    else:
+        side_info = 9 if mono else 17
+    return samples, sample_rate, length, side_info
+
+
+def mp3_duration(p):
+    """
+    Compute the duration of an MP3 file in seconds - without decoding any audio.
+
+    The number of frames is read from a Xing/Info or VBRI header if available, otherwise frame
+    headers are scanned through a memory map of the file. Like ffprobe, we subtract encoder delay
+    and padding if specified in a LAME extension of the Xing/Info header.
+    """
+    with p.open('rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+        pos = 0
+        if m[:3] == b'ID3':  # Skip an ID3v2 tag, whose size is stored as 4 "syncsafe" bytes.
+            size = m[6] << 21 | m[7] << 14 | m[8] << 7 | m[9]
+            pos = 10 + size + (10 if m[5] & 0x10 else 0)
+        # Find the first frame:
+        while pos + 4 <= len(m):
+            header = parse_frame_header(m[pos:pos + 4])
+            if header:
+                break
+            pos = m.find(b'\xff', pos + 1)
+            if pos < 0:
+                break
+        else:  # pragma: no cover
+            header = None
+        if not header or pos < 0:
+            raise ValueError('No MPEG audio frame found in {}'.format(p))
+        samples, sample_rate, _, side_info = header
+
+        vbri = pos + 36
+        if m[vbri:vbri + 4] == b'VBRI':
+            return struct.unpack('>I', m[vbri + 14:vbri + 18])[0] * samples / sample_rate
+
+        xing = pos + 4 + side_info
+        if m[xing:xing + 4] in (b'Xing', b'Info'):
+            flags = struct.unpack('>I', m[xing + 4:xing + 8])[0]
+            if flags & 1:
+                total = struct.unpack('>I', m[xing + 8:xing + 12])[0] * samples
+                # Skip frame count, byte count, TOC and quality indicator to get to the LAME
+                # extension, which specifies encoder delay and padding in samples.
+                lame = xing + 8 + sum(n for flag, n in [(1, 4), (2, 4), (4, 100), (8, 4)]
+                                      if flags & flag)
+                if m[lame:lame + 4] in (b'LAME', b'Lavf', b'Lavc'):
+                    delay_and_padding = int.from_bytes(m[lame + 21:lame + 24], 'big')
+                    total -= (delay_and_padding >> 12) + (delay_and_padding & 0xFFF)
+                return total / sample_rate
+
+        total = 0
+        while pos + 4 <= len(m):
+            header = parse_frame_header(m[pos:pos + 4])
+            if not header:  # E.g. an ID3v1 tag at the end of the file.
+                break
+            total += header[0] / header[1]
+            pos += header[2]
+        return total
+
+
+def audio_duration(p):
+    if p.suffix == '.wav':
+        with contextlib.closing(wave.open(str(p), 'r')) as f:  # pragma: no cover
+            return f.getnframes() / float(f.getframerate())
+    if p.suffix == '.mp3':
+        return mp3_duration(p)
+    raise ValueError(f'unknown audio format {p.suffix}')  # pragma: no cover
+
+
+class DurationCache(FileCache):
+    """
+    A persistent cache of audio durations.
+    """
+    def durations(self, paths, max_workers=None):
+        """
+        Compute durations for a list of audio files, probing files not in the cache concurrently.
+
+        :return: `dict` mapping file names to durations in seconds.
+        """
+        res, misses = {}, []
+        for p in paths:
+            duration = self.get(p)
+            if duration is None:
+                misses.append(p)
+            else:
+                res[p.name] = duration
+        if misses:
+            with concurrent.futures.ThreadPoolExecutor(
+                    max_workers=max_workers or min(8, os.cpu_count() or 1)) as executor:
+                for p, duration in zip(misses, executor.map(audio_duration, misses)):
+                    self.set(p, duration)
+                    res[p.name] = duration
+        return res
+
+
+class WavFile:
+    """
+    A PCM WAV file, mapped into memory.
+
+    Frames are returned as `memoryview` slices of the mapping, i.e. without reading, copying or
+    decoding any audio data. The RIFF chunks are parsed directly, so that the mapping is only
+    created once per file.
+
+    .. note:: The mapping can only be closed once all slices have been released; until then
+        closing is left to garbage collection.
+    """
+    def __init__(self, p):
+        self.path = p
+        with open(str(p), 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        m = self._mmap
+        if m[:4] != b'RIFF' or m[8:12] != b'WAVE':
+            self._mmap.close()
+            raise ValueError('{} is not a WAV file'.format(p))
+        fmt, data, pos = None, None, 12
+        while pos + 8 <= len(m) and not (fmt and data):
+            chunk, size = m[pos:pos + 4], struct.unpack('<I', m[pos + 4:pos + 8])[0]
+            if chunk == b'fmt ':
+                fmt = struct.unpack('<HHIIHH', m[pos + 8:pos + 24])
+            elif chunk == b'data':
+                # The size may be bogus for files written as streams.
+                data = (pos + 8, min(size, len(m) - pos - 8))
+            pos += 8 + size + (size & 1)  # Chunks are padded to an even size.
+        if not (fmt and data):
+            self._mmap.close()
+            raise ValueError('{} has no fmt or data chunk'.format(p))
+        _, self.nchannels, self.framerate, _, self.block_align, bits = fmt
+        self.sampwidth = bits // 8
+        self._offset, size = data
+        self.nframes = size // self.block_align
+        self._view = memoryview(m)
+
+    @property
+    def duration(self):
+        return self.nframes / self.framerate
+
+    def _frame(self, ms):
+        return max(0, min(self.nframes, round(ms * self.framerate / 1000)))
+
+    def frames(self, start=None, end=None):
+        """
+        The PCM frames between `start` and `end` milliseconds.
+
+        :return: `memoryview` of the raw frame data.
+        """
+        start = 0 if start is None else self._frame(start)
+        end = self.nframes if end is None else self._frame(end)
+        return self._view[
+            self._offset + start * self.block_align:
+            self._offset + max(start, end) * self.block_align]
+
+    def close(self):
+        self._view.release()
+        try:
+            self._mmap.close()
+        except BufferError:
+            pass  # There are still slices referencing the mapping.
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class WavCache:
+    """
+    A cache of `WavFile` instances, keeping at most `maxsize` files mapped into memory - closing
+    the least recently used mapping when the limit is reached.
+    """
+    def __init__(self, maxsize=16):
+        self.maxsize = maxsize
+        self._files = collections.OrderedDict()
+
+    def __getitem__(self, p):
+        if p in self._files:
+            self._files.move_to_end(p)
+        else:
+            if len(self._files) >= self.maxsize:
+                self._files.popitem(last=False)[1].close()
+            self._files[p] = WavFile(p)
+        return self._files[p]
+
+    def __len__(self):
+        return len(self._files)
+
+    def frames(self, p, start=None, end=None):
+        return self[p].frames(start, end)
+
+    def close(self):
+        while self._files:
+            self._files.popitem()[1].close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
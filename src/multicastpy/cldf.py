@@ -0,0 +1,50 @@
+"""
+Writing CLDF data.
+"""
+from csvw.dsv import UnicodeWriter
+
+__all__ = ['TableStream']
+
+
+class TableStream:
+    """
+    Writes the rows of a table of a CLDF dataset to its CSV file as they come in - rather than
+    collecting them in `CLDFWriter.objects`, to be written when the writer context is left.
+
+    Rows are serialized in the same way as by `csvw.Table.write`, so the resulting file is the
+    same. Since the schema determines the serialization, it must not be changed after the stream
+    has been opened.
+
+    Usage:
+
+    .. code-block:: python
+
+        >>> with TableStream(writer.cldf['ExampleTable']) as stream:
+        ...     stream.append(dict(ID='1', ...))
+    """
+    def __init__(self, table):
+        self.table = table
+        self.columns = [c for c in table.tableSchema.columns if not c.virtual]
+        self.count = 0
+        self._writer = None
+
+    def __enter__(self):
+        self._writer = UnicodeWriter(
+            self.table.url.resolve(self.table.base), dialect=self.table._get_dialect())
+        self._writer.__enter__()
+        if self.table._get_dialect().header:
+            self._writer.writerow([c.header for c in self.columns])
+        return self
+
+    def append(self, item):
+        self._writer.writerow([
+            col.write(item.get(col.header, item.get('{}'.format(col)))) for col in self.columns])
+        self.count += 1
+
+    def extend(self, items):
+        for item in items:
+            self.append(item)
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._writer.__exit__(exc_type, exc_val, exc_tb)
+        self.table.common_props['dc:extent'] = self.count
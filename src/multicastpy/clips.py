@@ -0,0 +1,177 @@
+"""
+Extraction of audio clips for the utterances of a Multi-CAST CLDF dataset.
+
+For WAV recordings, `WavClips` provides the PCM frames of utterances in-process. Otherwise, all
+clips of a recording are cut by a single ffmpeg process: The recording is read and decoded
+once and written to one output per clip, each delimited by output options `-ss` and `-to`. (The
+segment muxer is not an option, because utterances may overlap and need not be contiguous.)
+"""
+import os
+import json
+import hashlib
+import pathlib
+import subprocess
+import concurrent.futures
+
+import attr
+
+from .util import FileCache
+from .audio import WavCache
+
+__all__ = ['Clip', 'iter_recordings', 'extract_clips', 'WavClips']
+
+CACHE = '.clips.json'
+
+
+@attr.s(frozen=True)
+class Clip:
+    id = attr.ib()
+    start = attr.ib()  # milliseconds
+    end = attr.ib()  # milliseconds
+
+    def key(self, checksum):
+        """
+        Checksum over the inputs of the clip, i.e. the recording and the time range.
+        """
+        return hashlib.md5(json.dumps([checksum, self.start, self.end]).encode()).hexdigest()
+
+
+def iter_recordings(cldf, suffixes=('.wav', '.mp3')):
+    """
+    Group the utterances of a dataset by the audio recording they are taken from.
+
+    :param cldf: `pycldf.Dataset`
+    :param suffixes: Preferred suffixes of recordings, if an utterance references more than one.
+    :return: Generator of pairs `(path of the recording, list of Clip instances)`.
+    """
+    media = {}
+    for row in cldf.iter_rows('MediaTable', 'id', 'mediaType', 'downloadUrl'):
+        url = row['downloadUrl']
+        if (row['mediaType'] or '').startswith('audio/') and url and not url.scheme:
+            media[row['id']] = pathlib.Path(cldf.directory) / url.path
+
+    recordings = {}
+    for row in cldf.iter_rows('ExampleTable', 'id', 'mediaReference'):
+        paths = [media[mid] for mid in row['mediaReference'] or [] if mid in media]
+        if not paths or row['Audio_Start'] is None or row['Audio_End'] is None \
+                or row['Audio_End'] <= row['Audio_Start']:
+            continue
+        path = sorted(
+            paths,
+            key=lambda p: suffixes.index(p.suffix) if p.suffix in suffixes else len(suffixes))[0]
+        recordings.setdefault(path, []).append(
+            Clip(row['id'], row['Audio_Start'], row['Audio_End']))
+    yield from recordings.items()
+
+
+def ffmpeg_args(recording, clips, outdir, ffmpeg='ffmpeg'):
+    args = [ffmpeg, '-nostdin', '-hide_banner', '-loglevel', 'error', '-y', '-i', str(recording)]
+    for clip in clips:
+        args.extend([
+            '-map', '0:a',
+            '-ss', '{:.3f}'.format(clip.start / 1000),
+            '-to', '{:.3f}'.format(clip.end / 1000),
+            str(outdir / '{}{}'.format(clip.id, recording.suffix))])
+    return args
+
+
+def extract_clips(cldf, outdir, workers=None, ffmpeg='ffmpeg', log=None):
+    """
+    Write an audio clip for each utterance of a dataset with audio recording to `outdir`.
+
+    Clips are named `<utterance ID>.<suffix of the recording>`. Checksums of the clips and of
+    their inputs are stored in `outdir`, so that clips which exist and are unchanged are skipped.
+    Recordings are processed in parallel - one ffmpeg process per recording.
+
+    :return: Pair `(number of clips extracted, number of clips skipped)`.
+    """
+    outdir = pathlib.Path(outdir)
+    if not outdir.exists():
+        outdir.mkdir(parents=True)
+    cache = FileCache(path=outdir / CACHE)
+    todo, skipped = [], 0
+    for recording, clips in iter_recordings(cldf):
+        if not recording.exists():  # pragma: no cover
+            if log:
+                log.warning('missing recording {}'.format(recording))
+            continue
+        checksum = cache.checksum(recording)
+        missing = []
+        for clip in clips:
+            p = outdir / '{}{}'.format(clip.id, recording.suffix)
+            if p.exists() and cache.get(p) == clip.key(checksum):
+                skipped += 1
+            else:
+                missing.append(clip)
+        if missing:
+            todo.append((recording, checksum, missing))
+
+    extracted = 0
+    with concurrent.futures.ThreadPoolExecutor(
+            max_workers=workers or min(8, os.cpu_count() or 1)) as executor:
+        futures = {
+            executor.submit(
+                subprocess.run,
+                ffmpeg_args(recording, clips, outdir, ffmpeg=ffmpeg),
+                check=True,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE): (recording, checksum, clips)
+            for recording, checksum, clips in todo}
+        try:
+            for future in concurrent.futures.as_completed(futures):
+                recording, checksum, clips = futures[future]
+                future.result()
+                for clip in clips:
+                    cache.set(outdir / '{}{}'.format(clip.id, recording.suffix), clip.key(checksum))
+                extracted += len(clips)
+                if log:
+                    log.info('{}: {} clips'.format(recording.name, len(clips)))
+        finally:
+            # Keep track of what has been extracted so far, even if ffmpeg failed for a recording.
+            cache.save()
+    return extracted, skipped
+
+
+class WavClips:
+    """
+    Access to the PCM frames of utterances with WAV recordings - as `memoryview` slices of memory
+    mapped recordings, without copying or decoding audio data.
+
+    Usage:
+
+    .. code-block:: python
+
+        >>> with WavClips(cldf) as clips:
+        ...     frames = clips['isam_0001']
+    """
+    def __init__(self, cldf, maxsize=16):
+        """
+        :param maxsize: Maximal number of recordings to keep mapped into memory.
+        """
+        self.recordings = WavCache(maxsize=maxsize)
+        self.clips = {
+            clip.id: (recording, clip)
+            for recording, clips in iter_recordings(cldf, suffixes=('.wav',))
+            if recording.suffix == '.wav' for clip in clips}
+
+    def __contains__(self, uid):
+        return uid in self.clips
+
+    def __getitem__(self, uid):
+        recording, clip = self.clips[uid]
+        return self.recordings.frames(recording, clip.start, clip.end)
+
+    def frames(self, recording, start=None, end=None):
+        """
+        The PCM frames of a recording between `start` and `end` milliseconds.
+        """
+        return self.recordings.frames(recording, start, end)
+
+    def close(self):
+        self.recordings.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
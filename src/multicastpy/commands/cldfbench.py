@@ -10,6 +10,7 @@ from clldutils.clilib import PathType
 
 from multicastpy.repos import MultiCast
 from multicastpy.util import is_same
+from multicastpy.profiling import Profile
 
 
 def existing_dir(d):
@@ -23,10 +24,25 @@ def register(parser):
     parser.add_argument('--corpus', default=None)
     parser.add_argument('--version', default=None)
     parser.add_argument('--target-repos', default=None, type=PathType(type='dir'))
+    parser.add_argument(
+        '--cache-dir',
+        help="Directory to cache corpus metadata in (defaults to <repos>/.cache)",
+        type=PathType(type='dir', must_exist=False),
+        default=None)
+    parser.add_argument(
+        '--profile',
+        help="Path of a JSON file to write timings of the stages of seeding the repository to",
+        type=PathType(type='file', must_exist=False),
+        default=None)
+    parser.add_argument(
+        '--tracemalloc',
+        help="Also record memory peaks of the stages - which slows down processing",
+        action='store_true',
+        default=False)
 
 
 def run(args):
-    mc = MultiCast(args.repos)
+    mc = MultiCast(args.repos, cache_dir=args.cache_dir)
 
     if not args.corpus:
         if args.target_repos:
@@ -64,6 +80,14 @@ def run(args):
         args.log.error('No --target-repos specified')
         return 256
 
+    with Profile(memory=args.tracemalloc) as profile:
+        seed(mc, args, profile)
+    profile.report(args.log)
+    if args.profile:
+        profile.dump(args.profile)
+
+
+def seed(mc, args, profile):
     datadir = mc.data / args.version / args.corpus
     docsdir = mc.docs
     tdir = args.target_repos
@@ -74,7 +98,8 @@ def run(args):
     # seed the raw dir of a cldfbench with files according to the selected corpus and version.
     # copy:
     # - data files (tsv, xml, ...)
-    md = mc.metadata(args.version, args.corpus)
+    with profile('metadata'):
+        md = mc.metadata(args.version, args.corpus)
     dump({t.id: attr.asdict(t) for t in md.texts}, rdir / 'texts.json', indent=4)
     dump({
         "id": "mc{}".format(args.corpus),
@@ -112,33 +137,37 @@ def run(args):
 
     rdir.joinpath('sources.bib').write_text(md.sources_as_bibtex(), encoding='utf8')
 
-    for subdir in datadir.iterdir():
-        if subdir.is_dir():
-            for p in subdir.iterdir():
-                if p.stem == 'mc_{}'.format(args.corpus) or p.suffix == '.zip':  # pragma: no cover
-                    continue  # Ignore the aggregated files
-                shutil.copyfile(p, existing_dir(rdir / subdir.name) / p.name)
-
-    for suffix in ['mp3', 'wav']:
-        if mc.data.joinpath('audio', args.corpus, suffix).exists():
-            for p in mc.data.joinpath('audio', args.corpus, suffix).iterdir():
-                shutil.copyfile(p, existing_dir(rdir / 'audio') / p.name)
-
-    shutil.copyfile(mc.repos / 'images' / 'mc_{}.jpg'.format(args.corpus), rdir / 'image.jpg')
-    for fname, subdir in [
-        ('list-of-referents.tsv', 'tsv'),
-        ('annotation-notes.pdf', None),
-        ('translated-texts.pdf', None),
-        ('metadata.pdf', None),
-    ]:
-        pathcomps = ['corpora', fname.split('.')[0], args.corpus]
-        if subdir:
-            pathcomps.append(subdir)
-        pathcomps.append('mc_{}_{}'.format(args.corpus, fname))
-        try:
-            shutil.copyfile(docsdir.joinpath(*pathcomps), rdir / fname)
-        except FileNotFoundError:  # pragma: no cover
-            args.log.warning('No {} available.'.format(fname))
+    with profile('data'):
+        for subdir in datadir.iterdir():
+            if subdir.is_dir():
+                for p in subdir.iterdir():
+                    if p.stem == 'mc_{}'.format(args.corpus) or p.suffix == '.zip':
+                        continue  # pragma: no cover
+                    shutil.copyfile(p, existing_dir(rdir / subdir.name) / p.name)
+
+    with profile('audio'):
+        for suffix in ['mp3', 'wav']:
+            if mc.data.joinpath('audio', args.corpus, suffix).exists():
+                for p in mc.data.joinpath('audio', args.corpus, suffix).iterdir():
+                    shutil.copyfile(p, existing_dir(rdir / 'audio') / p.name)
+
+    with profile('docs'):
+        shutil.copyfile(
+            mc.repos / 'images' / 'mc_{}.jpg'.format(args.corpus), rdir / 'image.jpg')
+        for fname, subdir in [
+            ('list-of-referents.tsv', 'tsv'),
+            ('annotation-notes.pdf', None),
+            ('translated-texts.pdf', None),
+            ('metadata.pdf', None),
+        ]:
+            pathcomps = ['corpora', fname.split('.')[0], args.corpus]
+            if subdir:
+                pathcomps.append(subdir)
+            pathcomps.append('mc_{}_{}'.format(args.corpus, fname))
+            try:
+                shutil.copyfile(docsdir.joinpath(*pathcomps), rdir / fname)
+            except FileNotFoundError:  # pragma: no cover
+                args.log.warning('No {} available.'.format(fname))
 
     # non-empty refind / isnref columns in merged tsv determine corresponding feature.
     # empty refind / isnref: 0x2205 - empty set
@@ -146,6 +175,12 @@ def run(args):
     # "relations"!
     # -> extract referents-list.relations into assoc table referent_relations!
 
+    # Data cached between builds - in `Dataset.cache_dir` - must not end up in the repository.
+    gitignore = tdir / '.gitignore'
+    lines = gitignore.read_text(encoding='utf8').splitlines() if gitignore.exists() else []
+    if '.cache/' not in lines:
+        gitignore.write_text('\n'.join(lines + ['.cache/']) + '\n', encoding='utf8')
+
     tdir.joinpath('cldfbench_mc{}.py'.format(args.corpus)).write_text("""\
 import pathlib
 
@@ -0,0 +1,26 @@
+"""
+Extract audio clips for the utterances of a Multi-CAST CLDF dataset.
+
+Requires ffmpeg.
+"""
+from clldutils.clilib import PathType
+from pycldf.cli_util import add_dataset, get_dataset
+
+from multicastpy.clips import extract_clips
+
+
+def register(parser):
+    add_dataset(parser)
+    parser.add_argument('outdir', type=PathType(type='dir', must_exist=False))
+    parser.add_argument(
+        '--workers',
+        help="Number of recordings to process in parallel",
+        type=int,
+        default=None)
+    parser.add_argument('--ffmpeg', help="Path of the ffmpeg executable", default='ffmpeg')
+
+
+def run(args):
+    extracted, skipped = extract_clips(
+        get_dataset(args), args.outdir, workers=args.workers, ffmpeg=args.ffmpeg, log=args.log)
+    args.log.info('{} clips extracted, {} unchanged clips skipped'.format(extracted, skipped))
@@ -10,6 +10,7 @@
   - `git push origin`
   - `git push origin --tags`
 """
+import os
 import shlex
 import subprocess
 
@@ -17,8 +18,12 @@ from clldutils.jsonlib import load
 from clldutils.clilib import PathType
 
 
-def cmd(line):  # pragma: no cover
-    return subprocess.check_output(shlex.split(line), stderr=subprocess.STDOUT).decode('utf8')
+def cmd(line, **env):  # pragma: no cover
+    return subprocess.check_output(
+        shlex.split(line),
+        stderr=subprocess.STDOUT,
+        env=dict(os.environ, **{k: str(v) for k, v in env.items()}) if env else None,
+    ).decode('utf8')
 
 
 class Repos:  # pragma: no cover
@@ -38,6 +43,46 @@ class Repos:  # pragma: no cover
 def register(parser):  # pragma: no cover
     parser.add_argument('repos', type=PathType(type='dir'))
     parser.add_argument('--glottolog-version', default='v5.1')
+    parser.add_argument(
+        '--workers',
+        help="Number of worker processes used to convert texts in parallel",
+        type=int,
+        default=1)
+    parser.add_argument(
+        '--remap-workers',
+        help="Number of workers used to remap refind indices in annotation files in parallel",
+        type=int,
+        default=1)
+    parser.add_argument(
+        '--remap-processes',
+        help="Use worker processes rather than threads to remap refind indices",
+        action='store_true',
+        default=False)
+    parser.add_argument(
+        '--probe-workers',
+        help="Number of threads used to determine durations of audio files not cached yet "
+             "(0 means up to 8, depending on the number of CPUs)",
+        type=int,
+        default=0)
+    parser.add_argument(
+        '--incremental',
+        help="Only convert texts with changed inputs, re-using cached results for the others",
+        action='store_true',
+        default=False)
+    parser.add_argument(
+        '--stream-examples',
+        help="Write utterances to the CSV file as texts are converted, to limit memory usage",
+        action='store_true',
+        default=False)
+    parser.add_argument(
+        '--profile',
+        help="Path of a JSON file to write timings of the build stages and of each text to",
+        default=None)
+    parser.add_argument(
+        '--tracemalloc',
+        help="Also record memory peaks of the build stages - which slows down the build",
+        action='store_true',
+        default=False)
 
 
 def run(args):  # pragma: no cover
@@ -45,7 +90,15 @@ def run(args):  # pragma: no cover
     print(cmd(
         'cldfbench makecldf --with-zenodo --with-cldfreadme --glottolog-version {} {}'.format(
             args.glottolog_version, repos.mod,
-        )))
+        ),
+        MULTICAST_WORKERS=args.workers,
+        MULTICAST_REMAP_WORKERS=args.remap_workers,
+        MULTICAST_REMAP_PROCESSES=int(args.remap_processes),
+        MULTICAST_PROBE_WORKERS=args.probe_workers,
+        MULTICAST_INCREMENTAL=int(args.incremental),
+        MULTICAST_STREAM_EXAMPLES=int(args.stream_examples),
+        MULTICAST_TRACEMALLOC=int(args.tracemalloc),
+        **({'MULTICAST_PROFILE': args.profile} if args.profile else {})))
     print(cmd('cldfbench readme {}'.format(repos.mod)))
     print(cmd('cldf validate {}'.format(args.repos / 'cldf')))
     print(cmd('cldf splitmedia {}'.format(args.repos / 'cldf')))
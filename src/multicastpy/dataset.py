@@ -1,33 +1,239 @@
+import os
 import re
 import json
-import wave
 import shutil
 import pathlib
 import functools
-import mimetypes
 import contextlib
+import mimetypes
+import tracemalloc
+import collections
+import concurrent.futures
 
 import attr
-import ffmpeg
 from clldutils.markup import add_markdown_text
 from clldutils.path import md5
 from cldfbench import Dataset as BaseDataset, CLDFSpec, Metadata
 from pycldf import Sources
-from csvw.dsv import reader
 
-from .util import rmdir
-from .refind import iter_referents, refind_map, remap_refind
+from .util import rmdir, text_id, FileIndex, FileCache
+from .manifest import Manifest
+from .cldf import TableStream
+from .profiling import Profile
+from .refind import iter_referents, refind_map, remap_files, TsvIndex, ReferentGraph
 from .xml import UNMARKED, get_file
 from .eaf import add_orthography
+from .audio import AUDIO_SUFFIXES, DurationCache, audio_duration
+
+
+def option(args, name, default=None):
+    """
+    Build options are read from `args` - if `cmd_makecldf` is called programmatically - or from
+    an environment variable `MULTICAST_<NAME>`, because `cldfbench makecldf` does not accept
+    dataset-specific arguments.
+    """
+    res = getattr(args, name, None)
+    if res is None:
+        res = os.environ.get('MULTICAST_{}'.format(name.upper()))
+        if res is not None and isinstance(default, int):
+            res = int(res)
+    return default if res is None else res
+
+
+def is_copy(src, dest):
+    """
+    Cheap check - comparing stat results - whether a file has been copied from `src` and not
+    changed since.
+    """
+    return dest.st_size == src.st_size and dest.st_mtime_ns >= src.st_mtime_ns
+
+
+@attr.s(frozen=True)
+class TextContext:
+    """
+    Dataset-level data needed to convert individual texts.
+
+    Instances are passed to worker processes, so all attributes must be picklable.
+    """
+    lid = attr.ib()
+    language_id = attr.ib()
+    raw = attr.ib()  # FileIndex of the raw directory
+    media = attr.ib()  # FileIndex of cldf/media
+    refinds = attr.ib()
+    refind_map = attr.ib()
+    contributors = attr.ib()
+    citation = attr.ib()
+    sources = attr.ib()
+    durations = attr.ib(default=attr.Factory(dict))
+    # add_orthography by EAF file stem, read when refind indices are remapped.
+    orthography = attr.ib(default=attr.Factory(dict))
+
+
+@attr.s
+class TextRows:
+    """
+    The CLDF rows contributed by one text.
+    """
+    media = attr.ib(default=attr.Factory(list))
+    examples = attr.ib(default=attr.Factory(list))
+    contribution = attr.ib(default=None)
+    warnings = attr.ib(default=attr.Factory(list))
+
+
+def make_text(ctx, tid, t, profile=None):
+    """
+    Convert the files of one text - possibly split into several parts - to CLDF rows.
+
+    :param profile: `Profile` instance to record timings of the conversion steps.
+    """
+    profile = profile or Profile()
+    res = TextRows()
+    cfids, clauses, reclength = [], 0, 0
+    mdir = ctx.media.dir
+    for p in ctx.media.parts(tid, '.xml'):
+        with profile('xml', text=tid):
+            file = get_file(p)
+        with profile('orthography', text=tid):
+            orthography = ctx.orthography[p.stem] if p.stem in ctx.orthography \
+                else add_orthography(mdir / '{}.eaf'.format(p.stem))
+        if file.audio == 'NA':  # pragma: no cover
+            fname = pathlib.Path('mc_{}_{}.wav'.format(ctx.lid, tid))
+        else:
+            fname = pathlib.Path(re.sub(
+                r'_0(?P<c>[a-z])\.', lambda m: '_{}.'.format(m.group('c')), file.audio))
+        fids = []
+
+        for suffix in ['mp3', 'wav']:
+            path = ctx.raw.dir / 'audio' / '{}.{}'.format(fname.stem, suffix)
+            if path not in ctx.raw:
+                continue
+            fid = '_'.join(path.name.split('_')[2:]).replace('.', '_')
+            fids.append(fid)
+            with profile('audio', text=tid):
+                shutil.copyfile(path, mdir / path.name)
+                res.media.append(dict(
+                    ID=fid,
+                    Name=path.name,
+                    Media_Type=mimetypes.guess_type(path.name)[0],
+                    Size=ctx.raw.size(path),
+                    Length=ctx.durations[path.name]
+                    if path.name in ctx.durations else audio_duration(path),
+                    Contribution_ID=t['id'],
+                    Download_URL='{}/{}'.format(mdir.name, path.name),
+                ))
+
+        if res.media and 'Length' in res.media[-1]:
+            reclength += res.media[-1]['Length']
+
+        for suffix in ['eaf', 'xml', 'tsv']:
+            p = mdir / '{}.{}'.format(fname.stem, suffix)
+            fid = '_'.join(p.name.split('_')[2:]).replace('.', '_')
+            mtype = 'application/eaf+xml' if suffix == 'eaf' \
+                else mimetypes.guess_type(p.name)[0]
+            fids.append(fid)
+            res.media.append(dict(
+                ID=fid,
+                Name=p.name,
+                Media_Type=mtype,
+                Size=ctx.media.size(p),
+                Contribution_ID=t['id'],
+                Download_URL='{}/{}'.format(mdir.name, p.name),
+            ))
+
+        for unit in profile.iter('units', file, text=tid):
+            clauses += 1
+            with profile('igt', text=tid):
+                conformance = unit.conformance.name
+            if unit.refind and not all(
+                    refind in ctx.refinds for refind in unit.refind):  # pragma: no cover
+                res.warnings.append('skipping invalid refind {} in example'.format(unit.refind))
+            res.examples.append(dict(
+                ID='{}_{}'.format(tid, unit.uid),
+                Language_ID=ctx.language_id,
+                Text_ID=tid,
+                Primary_Text=unit.utterance,
+                Analyzed_Word=unit.gword,
+                Gloss=unit.gloss,
+                Translated_Text=unit.utterance_translation,
+                Comment=unit.add_comments,
+                Audio_Start=int(unit.start_time),
+                Audio_End=int(unit.end_time),  # milliseconds
+                Meta_Language_ID='en',
+                LGR_Conformance=conformance,
+                graid=unit.graid,
+                refind=unit.refind,
+                refindFK=[
+                    refind if refind in ctx.refinds else UNMARKED for refind in unit.refind],
+                isnref=unit.isnref,
+                add_orthography=orthography.get(unit.uid),
+                Media_IDs=fids,
+                Contribution_ID=tid,
+            ))
+        cfids.extend(fids)
+    res.contribution = dict(
+        ID=t['id'],
+        Name=t['title'] or t['id'],
+        Description=t['description'],
+        Contributor=ctx.contributors,
+        Citation=ctx.citation,
+        Text_Number=ctx.refind_map.get(tid),
+        Media_IDs=cfids,
+        Clause_Count=clauses,
+        Speaker=t['speaker'],
+        Speaker_Gender=t['gender'],
+        Speaker_Age=t['age'],
+        Speaker_Age_Approximated=t['age_estimated'],
+        Speaker_Year_Born=t['born'],
+        Speaker_Year_Born_Approximated=t['born_estimated'],
+        Type=t['type'],
+        Year_Recorded=int(t['recorded']),
+        Recording_Length=reclength,
+        Source=ctx.sources,
+    )
+    return res
+
+
+_CONTEXT = None
 
 
-def audio_duration(p):
-    if p.suffix == '.wav':
-        with contextlib.closing(wave.open(str(p), 'r')) as f:  # pragma: no cover
-            return f.getnframes() / float(f.getframerate())
-    if p.suffix == '.mp3':
-        return float(ffmpeg.probe(str(p))['format']['duration'])
-    raise ValueError(f'unknown audio format {p.suffix}')  # pragma: no cover
+def _init_worker(ctx, memory=False):  # pragma: no cover
+    global _CONTEXT
+    _CONTEXT = ctx
+    if memory:
+        tracemalloc.start()
+
+
+def _make_text_in_worker(item):  # pragma: no cover
+    profile = Profile(memory=tracemalloc.is_tracing())
+    with profile('total', text=item[0]):
+        res = make_text(_CONTEXT, *item, profile=profile)
+    return res, profile.texts
+
+
+def iter_texts(ctx, texts, workers=1, profile=None):
+    """
+    Convert texts, yielding `TextRows` in the order of `texts`.
+
+    With `workers > 1`, texts are converted in a pool of worker processes. Since results are
+    collected in input order, the CLDF output is the same as for a serial run.
+
+    :param profile: `Profile` instance to record timings of the conversion of each text - in \
+    worker processes, too.
+    """
+    profile = profile or Profile()
+    if workers > 1 and len(texts) > 1:
+        with concurrent.futures.ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_worker,
+                initargs=(ctx, profile.memory)) as executor:
+            for res, timings in executor.map(_make_text_in_worker, texts.items()):
+                profile.update(timings)
+                yield res
+    else:
+        for tid, t in texts.items():
+            with profile('total', text=tid):
+                res = make_text(ctx, tid, t, profile=profile)
+            yield res
 
 
 @attr.s
@@ -45,6 +251,7 @@ class MultiCastMetadata(Metadata):
 
 class Dataset(BaseDataset):
     metadata_cls = MultiCastMetadata
+    _referent_graph = None
 
     def cldf_specs(self):  # pragma: no cover
         return CLDFSpec(
@@ -63,19 +270,46 @@ class Dataset(BaseDataset):
 
     @functools.cached_property
     def with_refind(self):
-        return not all(isinstance(key, str) for key in self.refind_map)
+        return self.refind_map.has_refinds
 
     @functools.cached_property
     def with_isnref(self):
-        for t in self.raw_dir.joinpath('tsv').iterdir():
-            for r in reader(t, dicts=True, delimiter='\t'):
-                if r.get('isnref'):
-                    return True
-        return False  # pragma: no cover
+        return self.tsv_index.with_isnref
+
+    @functools.cached_property
+    def tsv_index(self):
+        return TsvIndex(self.raw_dir / 'tsv', cache=FileCache(self.cache_dir / 'tsv_index.json'))
 
     @functools.cached_property
     def refind_map(self):
-        return refind_map(self.raw_dir / 'tsv')
+        return refind_map(self.tsv_index)
+
+    def referent_graph(self, log=None):
+        """
+        The `ReferentGraph` of the referents listed for the corpus - built once per dataset.
+
+        Utterances mentioning referents are added to the graph when the CLDF data is built with
+        `cmd_makecldf`; only then can the graph be queried for `ReferentGraph.clauses`.
+        """
+        if self._referent_graph is None:
+            self._referent_graph = ReferentGraph(iter_referents(
+                self.raw_dir / 'list-of-referents.tsv', self.refind_map, log=log))
+        return self._referent_graph
+
+    @property
+    def cache_dir(self):
+        """
+        Directory for data cached between `makecldf` runs.
+        """
+        return self.dir / '.cache'
+
+    def audio_durations(self, args, raw):
+        cache = DurationCache(self.cache_dir / 'audio_durations.json', stat=raw.stat)
+        res = cache.durations(
+            raw.files('audio', AUDIO_SUFFIXES),
+            max_workers=option(args, 'probe_workers', default=0))
+        cache.save()
+        return res
 
     def cmd_readme(self, args):
         res = BaseDataset.cmd_readme(self, args)
@@ -129,39 +363,71 @@ class Dataset(BaseDataset):
         )
 
     def cmd_makecldf(self, args):
+        """
+        Timings - and with option `tracemalloc` memory peaks - of the build stages and of the
+        conversion of each text are reported to the log and, if option `profile` specifies a
+        path, written to a JSON file.
+        """
+        with Profile(memory=option(args, 'tracemalloc', default=0)) as profile:
+            converted = self._makecldf(args, profile)
+        profile.report(args.log)
+        if option(args, 'profile'):
+            profile.dump(pathlib.Path(option(args, 'profile')))
+        if converted:
+            args.log.info('{} of {} texts converted'.format(*converted))
 
-        self.add_schema(args.writer.cldf)
+    def _makecldf(self, args, profile):
+        # The TSV index and the refind map are computed - and cached - upon first access, which
+        # would otherwise happen when the schema is determined.
+        with profile('tsv_index'):
+            self.tsv_index
+        with profile('refind_map'):
+            self.refind_map
 
-        mdir = rmdir(self.cldf_dir / 'media')
-        mdir.mkdir()
-        for d in ['eaf', 'tsv', 'xml']:
-            for p in self.raw_dir.joinpath(d).glob('*.' + d):
-                shutil.copyfile(p, mdir / p.name)
-                remap_refind(mdir / p.name, self.refind_map)
+        with profile('schema'):
+            self.add_schema(args.writer.cldf)
+
+        # In incremental mode, we keep the media directory and only re-create the files for
+        # texts with changed inputs.
+        with profile('index'):
+            raw = FileIndex(self.raw_dir)
+            manifest = Manifest(self.cache_dir / 'manifest.json', stat=raw.stat) \
+                if option(args, 'incremental', default=0) else None
+            mdir = pathlib.Path(self.cldf_dir / 'media')
+            if not manifest:
+                rmdir(mdir)
+            if not mdir.exists():
+                mdir.mkdir()
+            media = FileIndex(mdir)
 
         docmap = {}
         for p in ['annotation-notes.pdf',
                   'image.jpg', 'metadata.pdf',
                   'translated-texts.pdf'] + self.metadata.docs:
-            p = self.raw_dir / p
-            if p.exists():
-                docmap[p.name] = md5(p)
-                shutil.copyfile(p, mdir / p.name)
+            p = raw.dir / p
+            if p in raw:
+                with profile('docs'):
+                    docmap[p.name] = md5(p)
+                    if not (manifest and mdir / p.name in media and is_copy(
+                            raw.stat(p), media.stat(mdir / p.name))):
+                        shutil.copyfile(p, mdir / p.name)
+                        media.add(mdir / p.name)
                 args.writer.objects['MediaTable'].append(dict(
                     ID=docmap[p.name],
                     Name=p.name,
                     Media_Type=mimetypes.guess_type(p.name)[0],
-                    Size=p.stat().st_size,
+                    Size=raw.size(p),
                     Download_URL='{}/{}'.format(mdir.name, p.name),
                 ))
         #
         # FIXME: use docmap to fix URLs in description!
         #
 
-        glang = args.glottolog.api.languoid(self.metadata.glottocode)
-        geolang = glang
-        while not geolang.latitude:
-            geolang = geolang.parent  # pragma: no cover
+        with profile('glottolog'):
+            glang = args.glottolog.api.languoid(self.metadata.glottocode)
+            geolang = glang
+            while not geolang.latitude:
+                geolang = geolang.parent  # pragma: no cover
         args.writer.objects['LanguageTable'].append(dict(
             ID=self.id,
             Name=self.metadata.language,
@@ -178,32 +444,21 @@ class Dataset(BaseDataset):
             Name='English',
             Glottocode='stan1293',
         ))
-        args.writer.cldf.sources = Sources.from_file(self.raw_dir / 'sources.bib')
-
-        i, refinds = -1, set()
-        for i, (row, rels) in enumerate(iter_referents(
-            self.raw_dir / 'list-of-referents.tsv',
-            self.refind_map,
-            log=args.log,
-        )):
-            if i == 0:
-                args.writer.objects['referents.csv'].append(dict(refind=UNMARKED))
-            args.writer.objects['referents.csv'].append(row)
-            refinds.add(row['refind'])
-            for relid, source, target, rel in rels:
-                args.writer.objects['referent_relations.csv'].append(dict(
-                    ID=relid,
-                    Source_Referent_ID=source,
-                    Target_Referent_ID=target,
-                    Relation=rel))
-        rrs = []
-        for row in args.writer.objects['referent_relations.csv']:
-            if row['Source_Referent_ID'] in refinds and row['Target_Referent_ID'] in refinds:
-                rrs.append(row)
-            else:
-                args.log.warning('skipping referent relation {}'.format(row))  # pragma: no cover
-        args.writer.objects['referent_relations.csv'] = rrs
-        if i < 0:  # pragma: no cover
+        with profile('sources'):
+            args.writer.cldf.sources = Sources.from_file(self.raw_dir / 'sources.bib')
+
+        with profile('referents'):
+            graph = self.referent_graph(log=args.log)
+        for relation in graph.skipped:  # pragma: no cover
+            args.log.warning('skipping referent relation {}'.format(relation))
+        if graph.referents:
+            args.writer.objects['referents.csv'].append(dict(refind=UNMARKED))
+            args.writer.objects['referents.csv'].extend(graph.referents.values())
+        args.writer.objects['referent_relations.csv'].extend(
+            dict(ID=relid, Source_Referent_ID=source, Target_Referent_ID=target, Relation=rel)
+            for relid, source, target, rel in graph.relations)
+        refinds = set(graph.referents)
+        if not refinds:  # pragma: no cover
             assert not self.with_refind
             args.writer.cldf.remove_table('referents.csv')
             if 'referent_relations.csv' in args.writer.cldf:
@@ -212,105 +467,96 @@ class Dataset(BaseDataset):
 
         refinds = {str(refind) for refind in refinds}
         refinds.add(UNMARKED)
-        for tid, t in self.raw_dir.read_json('texts.json').items():
-            #
-            # FIXME: create HTML views of the texts! put in gh-pages?
-            #
-            cfids, clauses, reclength = [], 0, 0
-            for p in mdir.glob('mc_{}_{}*.xml'.format(self.lid, tid)):
-                file = get_file(p)
-                orthography = add_orthography(mdir / '{}.eaf'.format(p.stem))
-                if file.audio == 'NA':  # pragma: no cover
-                    fname = pathlib.Path('mc_{}_{}.wav'.format(self.lid, tid))
-                else:
-                    fname = pathlib.Path(re.sub(
-                        r'_0(?P<c>[a-z])\.', lambda m: '_{}.'.format(m.group('c')), file.audio))
-                fids = []
-
-                for suffix in ['mp3', 'wav']:
-                    path = self.raw_dir / 'audio' / '{}.{}'.format(fname.stem, suffix)
-                    if not path.exists():
-                        continue
-                    fid = '_'.join(path.name.split('_')[2:]).replace('.', '_')
-                    fids.append(fid)
-                    shutil.copyfile(path, mdir / path.name)
-                    args.writer.objects['MediaTable'].append(dict(
-                        ID=fid,
-                        Name=path.name,
-                        Media_Type=mimetypes.guess_type(path.name)[0],
-                        Size=path.stat().st_size,
-                        Length=audio_duration(path),
-                        Contribution_ID=t['id'],
-                        Download_URL='{}/{}'.format(mdir.name, path.name),
-                    ))
-
-                if 'Length' in args.writer.objects['MediaTable'][-1]:
-                    reclength += args.writer.objects['MediaTable'][-1]['Length']
-
-                for suffix in ['eaf', 'xml', 'tsv']:
-                    p = mdir / '{}.{}'.format(fname.stem, suffix)
-                    fid = '_'.join(p.name.split('_')[2:]).replace('.', '_')
-                    mtype = 'application/eaf+xml' if suffix == 'eaf' \
-                        else mimetypes.guess_type(p.name)[0]
-                    fids.append(fid)
-                    args.writer.objects['MediaTable'].append(dict(
-                        ID=fid,
-                        Name=p.name,
-                        Media_Type=mtype,
-                        Size=p.stat().st_size,
-                        Contribution_ID=t['id'],
-                        Download_URL='{}/{}'.format(mdir.name, p.name),
-                    ))
-
-                for unit in file:
-                    clauses += 1
-                    if unit.refind and not all(
-                            refind in refinds for refind in unit.refind):  # pragma: no cover
-                        args.log.warning(
-                            'skipping invalid refind {} in example'.format(unit.refind))
-                    args.writer.objects['ExampleTable'].append(dict(
-                        ID='{}_{}'.format(tid, unit.uid),
-                        Language_ID=self.id,
-                        Text_ID=tid,
-                        Primary_Text=unit.utterance,
-                        Analyzed_Word=unit.gword,
-                        Gloss=unit.gloss,
-                        Translated_Text=unit.utterance_translation,
-                        Comment=unit.add_comments,
-                        Audio_Start=int(unit.start_time),
-                        Audio_End=int(unit.end_time),  # milliseconds
-                        Meta_Language_ID='en',
-                        LGR_Conformance=unit.igt.conformance.name,
-                        graid=unit.graid,
-                        refind=unit.refind,
-                        refindFK=[
-                            refind if refind in refinds else UNMARKED for refind in unit.refind],
-                        isnref=unit.isnref,
-                        add_orthography=orthography.get(unit.uid),
-                        Media_IDs=fids,
-                        Contribution_ID=tid,
-                    ))
-                cfids.extend(fids)
-            args.writer.objects['ContributionTable'].append(dict(
-                ID=t['id'],
-                Name=t['title'] or t['id'],
-                Description=t['description'],
-                Contributor=self.metadata.contributors,
-                Citation=self.metadata.citation,
-                Text_Number=self.refind_map.get(tid),
-                Media_IDs=cfids,
-                Clause_Count=clauses,
-                Speaker=t['speaker'],
-                Speaker_Gender=t['gender'],
-                Speaker_Age=t['age'],
-                Speaker_Age_Approximated=t['age_estimated'],
-                Speaker_Year_Born=t['born'],
-                Speaker_Year_Born_Approximated=t['born_estimated'],
-                Type=t['type'],
-                Year_Recorded=int(t['recorded']),
-                Recording_Length=reclength,
-                Source=sorted(args.writer.cldf.sources.keys()),
-            ))
+        with profile('audio_durations'):
+            durations = self.audio_durations(args, raw)
+        ctx = TextContext(
+            lid=self.lid,
+            language_id=self.id,
+            raw=raw,
+            media=media,
+            refinds=frozenset(refinds),
+            refind_map=self.refind_map,
+            contributors=self.metadata.contributors,
+            citation=self.metadata.citation,
+            sources=sorted(args.writer.cldf.sources.keys()),
+            durations=durations,
+        )
+        texts = self.raw_dir.read_json('texts.json')
+        annotations = collections.defaultdict(list)
+        for d in ['eaf', 'tsv', 'xml']:
+            for p in raw.files(d, ['.' + d]):
+                annotations[text_id(p)].append(p)
+
+        keys, cached = {}, set()
+        if manifest:
+            with profile('manifest'):
+                refind_inputs = collections.defaultdict(list)
+                for key, num in self.refind_map.items():
+                    if isinstance(key, tuple):
+                        refind_inputs[key[0]].append([key[1], num, str(num) in ctx.refinds])
+                for tid, t in texts.items():
+                    keys[tid] = manifest.text_key(
+                        raw.texts[tid],
+                        t,
+                        [ctx.lid, ctx.language_id, ctx.contributors, ctx.citation, ctx.sources],
+                        [self.refind_map.get(tid), sorted(refind_inputs[tid])],
+                    )
+                    if manifest.is_current(tid, keys[tid], media):
+                        cached.add(tid)
+
+        with profile('remap'):
+            items = [
+                (p, mdir / p.name)
+                for tid, paths in annotations.items() if tid not in cached for p in paths]
+            for (p, target), orthography in zip(items, remap_files(
+                    items,
+                    self.refind_map,
+                    tsv_index=self.tsv_index,
+                    workers=option(args, 'remap_workers', default=1),
+                    processes=option(args, 'remap_processes', default=0),
+                    log=args.log)):
+                if orthography is not None:
+                    ctx.orthography[p.stem] = orthography
+                media.add(target)
+
+        todo = {tid: t for tid, t in texts.items() if tid not in cached}
+        converted = iter_texts(
+            ctx, todo, workers=option(args, 'workers', default=1), profile=profile)
+        keep = set(docmap).union(p.name for paths in annotations.values() for p in paths)
+        with contextlib.ExitStack() as stack:
+            if option(args, 'stream_examples', default=0) \
+                    and 'ExampleTable' not in (args.writer.cldf_spec.zipped or []):
+                # Write utterances to the CSV file as texts are converted, rather than keeping
+                # all of them in memory.
+                examples = stack.enter_context(TableStream(args.writer.cldf['ExampleTable']))
+            else:
+                examples = args.writer.objects['ExampleTable']
+            for tid in texts:
+                with profile('texts'):
+                    if tid in todo:
+                        res = next(converted)
+                        if manifest:
+                            manifest.set(tid, keys[tid], res, media)
+                    else:
+                        res = TextRows(**manifest.rows(tid))
+                for msg in res.warnings:  # pragma: no cover
+                    args.log.warning(msg)
+                for r in res.examples:
+                    graph.add_mentions(
+                        r['ID'], [int(ref) for ref in r['refind'] or [] if ref != UNMARKED])
+                keep.update(r['Name'] for r in res.media)
+                args.writer.objects['MediaTable'].extend(res.media)
+                examples.extend(res.examples)
+                args.writer.objects['ContributionTable'].append(res.contribution)
+
+        if manifest:
+            with profile('cleanup'):
+                # Remove files from the media directory which are no longer part of the dataset.
+                for p in media:
+                    if p.name not in keep:
+                        media.unlink(p)
+                manifest.save()
+            return len(todo), len(texts)
 
     def add_schema(self, cldf):
         cldf.add_component(
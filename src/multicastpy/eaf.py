@@ -1,35 +1,90 @@
 """
 Functionality to parse ELAN's .eaf files.
 """
+import pathlib
+import collections
+
 from lxml.etree import parse
 
-__all__ = ['remap_refind', 'add_orthography']
+from .xml import dump_xml
+
+__all__ = ['EafDocument', 'remap_refind', 'add_orthography']
+
+
+class EafDocument:
+    """
+    An EAF document, parsed once and indexed, so that tiers and annotations can be looked up
+    rather than searched for.
+
+    - `tiers` maps TIER_ID to `TIER` elements,
+    - `annotations` maps ANNOTATION_ID to `ALIGNABLE_ANNOTATION` or `REF_ANNOTATION` elements,
+    - `refs` maps ANNOTATION_ID to the list of `REF_ANNOTATION` elements referencing it.
+    """
+    def __init__(self, doc):
+        """
+        :param doc: Path of an EAF file or the root element of a parsed EAF document.
+        """
+        if isinstance(doc, (str, pathlib.Path)):
+            doc = parse(str(doc)).getroot()
+        self.doc = doc
+        self.tiers, self.annotations = {}, {}
+        self.refs = collections.defaultdict(list)
+        for tier in doc.iterchildren('TIER'):
+            self.tiers[tier.get('TIER_ID')] = tier
+            for a in self._iter_annotations(tier):
+                self.annotations[a.get('ANNOTATION_ID')] = a
+                if a.get('ANNOTATION_REF'):
+                    self.refs[a.get('ANNOTATION_REF')].append(a)
+
+    @staticmethod
+    def _iter_annotations(tier):
+        for e in tier.iterchildren('ANNOTATION'):
+            yield from e.iterchildren('ALIGNABLE_ANNOTATION', 'REF_ANNOTATION')
+
+    def iter_annotations(self, tier_id):
+        if tier_id in self.tiers:
+            yield from self._iter_annotations(self.tiers[tier_id])
+
+    @staticmethod
+    def value(annotation):
+        return annotation.find('ANNOTATION_VALUE').text
+
+    @property
+    def media_url(self):
+        return self.doc.find('.//MEDIA_DESCRIPTOR').attrib['MEDIA_URL']
+
+    def write(self, target, newline='\n'):
+        dump_xml(self.doc, target, newline=newline)
+
+    def remap_refind(self, refind_map, tid):
+        for a in self.iter_annotations('refind'):
+            e = a.find('ANNOTATION_VALUE')
+            try:
+                e.text = str(refind_map[tid, e.text])
+            except KeyError:  # pragma: no cover
+                stem = self.media_url.split('.')[0]
+                e.text = str(refind_map['_'.join(stem.split('_')[2:]), e.text])
+
+    def add_orthography(self):
+        """
+        :return: `dict` mapping unit IDs to the value of the add_orthography tier.
+        """
+        tier = self.tiers.get('add_orthography')
+        if tier is None or tier.get('PARENT_REF') != 'utterance':
+            return {}
+        res = {}
+        for a in self._iter_annotations(tier):
+            # add_orthography -> utterance -> utterance_id
+            uid = self.annotations[self.annotations[a.get('ANNOTATION_REF')].get('ANNOTATION_REF')]
+            res[tuple(self.value(uid).split('_'))] = self.value(a)
+        # Make sure we only have utterances from exactly one text:
+        assert len({k[0] for k in res}) == 1 and len({k[1] for k in res}) == 1
+        return {k[2]: v for k, v in res.items()}
 
 
 def remap_refind(doc, refind_map, tid):
-    for e in doc.xpath(
-            ".//TIER[@TIER_ID='refind']/ANNOTATION/REF_ANNOTATION/ANNOTATION_VALUE"):
-        try:
-            e.text = str(refind_map[tid, e.text])
-        except KeyError:  # pragma: no cover
-            stem = doc.xpath('.//MEDIA_DESCRIPTOR')[0].attrib['MEDIA_URL'].split('.')[0]
-            e.text = str(refind_map['_'.join(stem.split('_')[2:]), e.text])
+    EafDocument(doc).remap_refind(refind_map, tid)
 
 
 def add_orthography(p):
-    eaf = parse(p).getroot()
-    if not eaf.xpath(".//TIER[@TIER_ID='add_orthography' and @PARENT_REF='utterance']"):
-        return {}
-    add_orthography = {
-        a.attrib['ANNOTATION_REF']: a.xpath('ANNOTATION_VALUE')[0].text
-        for a in eaf.xpath(".//TIER[@TIER_ID='add_orthography' and @PARENT_REF='utterance']"
-                           "/ANNOTATION/REF_ANNOTATION")
-    }
-    for a in eaf.xpath(".//TIER[@TIER_ID='utterance']/ANNOTATION/REF_ANNOTATION"):
-        add_orthography[a.attrib['ANNOTATION_REF']] = add_orthography.pop(a.attrib['ANNOTATION_ID'])
-    for a in eaf.xpath(".//TIER[@TIER_ID='utterance_id']/ANNOTATION/ALIGNABLE_ANNOTATION"):
-        add_orthography[tuple(a.xpath('ANNOTATION_VALUE')[0].text.split('_'))] = (
-            add_orthography.pop(a.attrib['ANNOTATION_ID']))
-    # Make sure we only have utterances from exactly one text:
-    assert len({k[0] for k in add_orthography}) == 1 and len({k[1] for k in add_orthography}) == 1
-    return {k[2]: v for k, v in add_orthography.items()}
+    return EafDocument(p).add_orthography()
@@ -0,0 +1,59 @@
+"""
+Fast checking of the conformance of glossed words with the Leipzig Glossing Rules.
+
+`pyigt.IGT.conformance` parses each word and gloss into morphemes and gloss elements. To only
+determine the conformance level, it is enough to compare the numbers of words and glosses
+(LGR Rule 1) and the morpheme separators of each word and its gloss (Rule 2). We do this directly,
+following the checks in `pyigt.IGT.check`, so the results are the same.
+"""
+import re
+import functools
+
+from pyigt import LGRConformance
+from pyigt.lgrmorphemes import MORPHEME_SEPARATORS
+
+__all__ = ['conformance', 'file_conformance']
+
+SPLIT_MORPHEMES = re.compile('({})'.format('|'.join(re.escape(c) for c in MORPHEME_SEPARATORS)))
+
+
+@functools.lru_cache(maxsize=100000)
+def is_morpheme_aligned(word, gloss):
+    """
+    Check whether the morphemes of a word are aligned with the morpheme glosses (LGR Rule 2).
+    """
+    morphemes, glosses = SPLIT_MORPHEMES.split(word or ''), SPLIT_MORPHEMES.split(gloss or '')
+    if len(morphemes) != len(glosses):
+        return False
+    for m, g in zip(morphemes, glosses):
+        if not m and not g:
+            continue  # Morpheme starts or ends with separator
+        if m in MORPHEME_SEPARATORS:
+            if m != g:
+                return False
+        elif not (m and g):
+            return False
+    return True
+
+
+def conformance(words, glosses):
+    """
+    :param words: `list` of gloss-aligned words, e.g. `Unit._gword`.
+    :param glosses: `list` of word-aligned glosses, e.g. `Unit._gloss`.
+    :return: `LGRConformance` level.
+    """
+    if len(words) != len(glosses):
+        return LGRConformance.UNALIGNED
+    if all(is_morpheme_aligned(w, g) for w, g in zip(words, glosses)):
+        return LGRConformance.MORPHEME_ALIGNED
+    return LGRConformance.WORD_ALIGNED
+
+
+def file_conformance(file):
+    """
+    Check the conformance of all units of a file.
+
+    :param file: `File` instance or iterable of `Unit` instances.
+    :return: `dict` mapping unit IDs to `LGRConformance` levels.
+    """
+    return {unit.uid: unit.conformance for unit in file}
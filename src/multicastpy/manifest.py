@@ -0,0 +1,99 @@
+"""
+Bookkeeping for incremental builds of the CLDF data of a corpus.
+"""
+import json
+import hashlib
+
+import attr
+from clldutils.jsonlib import load, dump
+
+from .util import FileCache
+
+__all__ = ['Manifest']
+
+# Bump this, whenever the way CLDF rows are derived from the raw data changes, to invalidate all
+# rows cached in existing manifests.
+FORMAT_VERSION = 3
+
+
+class Manifest:
+    """
+    The manifest of a build records
+
+    - md5 checksums of the raw input files,
+    - for each text, a checksum over all inputs which determine the text's CLDF rows, and the
+      md5 checksums of the files it contributed to `cldf/media`.
+
+    The rows of each text are stored next to the manifest, in `texts/<ID>.json`.
+
+    Thus, a text only needs to be converted again if one of its inputs changed, or if one of the
+    files it contributed to `cldf/media` has been altered or removed.
+    """
+    def __init__(self, path, stat=None):
+        self.path = path
+        data = load(path) if path.exists() else {}
+        if data.get('version') != FORMAT_VERSION:
+            data = {}
+        self.files = FileCache(stat=stat)
+        self.files.entries = data.get('files', {})
+        # Checksums of output files are kept separately, since outputs have the names of inputs.
+        self.outputs = FileCache()
+        self.outputs.entries = data.get('outputs', {})
+        self.texts = data.get('texts', {})
+
+    def text_key(self, paths, *inputs):
+        """
+        Checksum over the content of the files in `paths` and over additional JSON serializable
+        inputs.
+        """
+        return hashlib.md5(json.dumps(
+            [[p.name, self.files.checksum(p)] for p in sorted(paths)] + list(inputs),
+            sort_keys=True,
+            ensure_ascii=False,
+        ).encode('utf8')).hexdigest()
+
+    def is_current(self, tid, key, media):
+        """
+        Check whether the cached rows for a text are still valid.
+
+        :param media: `FileIndex` of the media directory.
+        """
+        entry = self.texts.get(tid)
+        if entry and entry['key'] == key and self._rows_path(tid).exists():
+            for name, checksum in entry['outputs'].items():
+                p = media.dir / name
+                if p not in media or self.outputs.checksum(p) != checksum:
+                    return False
+            return True
+        return False
+
+    def _rows_path(self, tid):
+        return self.path.parent / 'texts' / '{}.json'.format(tid)
+
+    def rows(self, tid):
+        """
+        Load the cached rows for a text.
+
+        Rows are stored in one file per text, so that they only need to be read when needed.
+        """
+        return load(self._rows_path(tid))
+
+    def set(self, tid, key, rows, media):
+        if not self._rows_path(tid).parent.exists():
+            self._rows_path(tid).parent.mkdir(parents=True)
+        dump(attr.asdict(rows), self._rows_path(tid), indent=None)
+        self.texts[tid] = dict(
+            key=key,
+            outputs={r['Name']: self.outputs.checksum(media.dir / r['Name']) for r in rows.media})
+
+    def save(self):
+        if not self.path.parent.exists():
+            self.path.parent.mkdir(parents=True)
+        dump(
+            dict(
+                version=FORMAT_VERSION,
+                files=self.files.entries,
+                outputs=self.outputs.entries,
+                texts=self.texts),
+            self.path,
+            indent=None)
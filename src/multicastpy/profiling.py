@@ -0,0 +1,111 @@
+"""
+Instrumentation of the stages of long running processes - like building the CLDF data of a corpus.
+"""
+import time
+import tracemalloc
+import contextlib
+import collections
+
+from clldutils.jsonlib import dump
+
+__all__ = ['Profile']
+
+
+class Profile:
+    """
+    Collects wall-clock times and - if `memory` is set - peaks of the memory allocated by Python
+    (as reported by `tracemalloc`) for named stages of a process and of the processing of
+    individual texts.
+
+    Usage:
+
+    .. code-block:: python
+
+        >>> with Profile(memory=True) as profile:
+        ...     with profile('parse'):
+        ...         pass
+        ...     with profile('parse', text='isam'):
+        ...         pass
+        >>> profile.report(log)
+
+    Stages may be nested and may be entered repeatedly, in which case times are summed up.
+    """
+    def __init__(self, memory=False):
+        self.memory = bool(memory)
+        self.stages = collections.OrderedDict()
+        self.texts = collections.OrderedDict()
+        self._peaks = []  # Running peaks of the active stages.
+        self._started = False
+
+    def __enter__(self):
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started = True
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self._started:
+            tracemalloc.stop()
+            self._started = False
+
+    @contextlib.contextmanager
+    def __call__(self, stage, text=None):
+        stages = self.stages if text is None \
+            else self.texts.setdefault(text, collections.OrderedDict())
+        record = stages.setdefault(stage, dict(seconds=0.0, calls=0))
+        memory = self.memory and tracemalloc.is_tracing()
+        if memory:
+            if self._peaks:  # The peak up to now is attributed to the enclosing stage.
+                self._peaks[-1] = max(self._peaks[-1], tracemalloc.get_traced_memory()[1])
+            if hasattr(tracemalloc, 'reset_peak'):  # Python >= 3.9
+                tracemalloc.reset_peak()
+            self._peaks.append(0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            record['seconds'] += time.perf_counter() - start
+            record['calls'] += 1
+            if memory:
+                peak = max(self._peaks.pop(), tracemalloc.get_traced_memory()[1])
+                record['peak'] = max(record.get('peak', 0), peak)
+                if self._peaks:
+                    self._peaks[-1] = max(self._peaks[-1], peak)
+
+    def iter(self, stage, items, text=None):
+        """
+        Iterate over `items`, recording the time it takes to produce each item for `stage`.
+        """
+        items = iter(items)
+        while True:
+            with self(stage, text=text):
+                item = next(items, StopIteration)
+            if item is StopIteration:
+                return
+            yield item
+
+    def update(self, texts):
+        """
+        Add records for texts which have been processed elsewhere, e.g. in a worker process.
+        """
+        self.texts.update(texts)
+
+    @staticmethod
+    def _format(stage, record):
+        res = '{} {:.3f}s'.format(stage, record['seconds'])
+        if 'peak' in record:
+            res += ' {:.1f}MB'.format(record['peak'] / 1024 ** 2)
+        return res
+
+    def report(self, log):
+        for stage, record in self.stages.items():
+            log.info('stage {}'.format(self._format(stage, record)))
+        for tid, stages in self.texts.items():
+            log.info('text {}: {}'.format(
+                tid, ', '.join(self._format(stage, record) for stage, record in stages.items())))
+
+    def asdict(self):
+        return dict(stages=self.stages, texts=self.texts)
+
+    def dump(self, path):
+        dump(self.asdict(), path, indent=2)
@@ -1,44 +1,210 @@
 """
 Handling of refind annotations and referent metadata.
 """
+import io
 import re
+import csv
+import array
+import bisect
+import codecs
+import shutil
 import itertools
 import collections
+import collections.abc
+import concurrent.futures
 
+import attr
 from csvw.dsv import reader, UnicodeWriter
 
-from .xml import updateable_xml, remap_refind as xml_remap_refind
-from .eaf import remap_refind as eaf_remap_refind
+from .xml import (
+    UNMARKED, updateable_xml, remap_refind as xml_remap_refind, copy_remapped as xml_copy)
+from .eaf import EafDocument
+from .util import text_id, replacing
 
-__all__ = ['iter_referents', 'remap_refind', 'refind_map']
+__all__ = [
+    'iter_referents', 'remap_refind', 'remap_files', 'refind_map', 'RefindMap', 'TsvIndex',
+    'ReferentGraph']
+
+
+@attr.s
+class TsvFile:
+    path = attr.ib()
+    columns = attr.ib()
+    refinds = attr.ib(default=attr.Factory(set))
+    with_isnref = attr.ib(default=False)
+
+    @property
+    def tid(self):
+        return text_id(self.path)
+
+
+def scan_tsv(p, columns=('refind', 'isnref')):
+    """
+    Read the header and the values of selected columns of a TSV file.
+
+    Rows are split on tabs at the byte level - only as far as needed to get to the selected
+    columns. Files containing quotes or bare carriage returns are parsed with the `csv` module,
+    to get the same result as with `csvw.dsv.reader`. As with `reader(p, dicts=True)`, blank lines
+    are skipped and short rows are padded with empty values.
+
+    :return: Pair `(header, dict mapping column names to lists of values)`.
+    """
+    data = p.read_bytes()
+    if data.startswith(codecs.BOM_UTF8):
+        data = data[len(codecs.BOM_UTF8):]
+    data = data.replace(b'\r\n', b'\n')
+    if b'"' in data or b'\r' in data:
+        rows = csv.reader(io.StringIO(data.decode('utf8'), newline=''), delimiter='\t')
+        header = next(rows, [])
+        indices = [(col, header.index(col)) for col in columns if col in header]
+        res = {col: [] for col, _ in indices}
+        for row in rows:
+            if row:
+                for col, i in indices:
+                    res[col].append(row[i] if i < len(row) else '')
+        return header, res
+
+    lines = data.split(b'\n')
+    if lines[-1] == b'':
+        lines.pop()
+    header = lines[0].decode('utf8').split('\t') if lines else []
+    indices = [(col, header.index(col)) for col in columns if col in header]
+    res = {col: [] for col, _ in indices}
+    if indices:
+        maxsplit = max(i for _, i in indices) + 1
+        for line in itertools.islice(lines, 1, None):
+            if line:
+                fields = line.split(b'\t', maxsplit)
+                for col, i in indices:
+                    res[col].append(fields[i].decode('utf8') if i < len(fields) else '')
+    return header, res
+
+
+class TsvIndex:
+    """
+    Information about the TSV files of a corpus, collected in one pass over the files.
+
+    :param cache: `FileCache` to store the information per file, so that only files which changed \
+    need to be read again.
+    """
+    def __init__(self, tsvdir, cache=None):
+        self.files = collections.OrderedDict()
+        for p in sorted(tsvdir.iterdir(), key=lambda p: p.stem):
+            info = cache.get(p) if cache else None
+            if info is None:
+                header, values = scan_tsv(p)
+                info = dict(
+                    columns=header,
+                    refinds=sorted(set(v for v in values['refind'] if v)),
+                    with_isnref=any(values.get('isnref', [])))
+                if cache:
+                    cache.set(p, info)
+            self.files[p.name] = TsvFile(
+                path=p,
+                columns=info['columns'],
+                refinds=set(info['refinds']),
+                with_isnref=info['with_isnref'])
+        if cache:
+            cache.save()
+
+    @property
+    def with_isnref(self):
+        return any(f.with_isnref for f in self.files.values())
+
+    def refinds(self):
+        """
+        :return: `OrderedDict` mapping text IDs to the set of referent indices used in the text.
+        """
+        res = collections.OrderedDict()
+        for f in self.files.values():
+            res.setdefault(f.tid, set()).update(f.refinds)
+        return res
+
+
+class RefindMap(collections.abc.Mapping):
+    """
+    Map of referent indices to dataset-unique integers.
+
+    Texts are numbered consecutively, and refind `r` of the text with number `i` is mapped to
+    `i * 10 ** width + int(r)`, where `width` is the number of digits of the biggest refind. Thus,
+    we only need to store the text numbers and - per text - the sorted refinds and an array of their
+    integer values.
+
+    For compatibility, the map also provides the `Mapping` interface of a `dict` with keys
+    `tid` for text numbers and `(tid, refind)` for mapped refinds.
+    """
+    def __init__(self, refinds):
+        """
+        :param refinds: `dict` mapping text IDs to iterables of referent indices used in the text.
+        """
+        self.texts, self._refinds, self._offsets = {}, {}, {}
+        for i, (tid, ids) in enumerate(refinds.items(), start=1):
+            self.texts[tid] = i
+            self._refinds[tid] = tuple(sorted(ids))
+            self._offsets[tid] = array.array('L', [int(r) for r in self._refinds[tid]])
+        # Compute the number of digits we need for the "old" index.
+        try:
+            self.width = len(str(max(max(o) for o in self._offsets.values() if o)))
+        except ValueError:
+            self.width = 0
+        self._factor = 10 ** self.width
+        self.has_refinds = any(self._refinds.values())
+
+    def remap(self, tid, refind):
+        """
+        :raises KeyError: If `refind` is not used in text `tid`.
+        """
+        refinds = self._refinds[tid]
+        i = bisect.bisect_left(refinds, refind)
+        if i == len(refinds) or refinds[i] != refind:
+            raise KeyError((tid, refind))
+        return self.texts[tid] * self._factor + self._offsets[tid][i]
+
+    def remap_many(self, tid, refinds):
+        """
+        Map a sequence of referent indices of one text.
+
+        :return: `list` of `int`.
+        """
+        offsets, base, res = self._offsets[tid], self.texts[tid] * self._factor, []
+        index = self._refinds[tid]
+        for refind in refinds:
+            i = bisect.bisect_left(index, refind)
+            if i == len(index) or index[i] != refind:
+                raise KeyError((tid, refind))
+            res.append(base + offsets[i])
+        return res
+
+    def __getitem__(self, key):
+        if isinstance(key, tuple):
+            return self.remap(*key)
+        return self.texts[key]
+
+    def __contains__(self, key):
+        try:
+            self[key]
+        except (KeyError, TypeError):
+            return False
+        return True
+
+    def __iter__(self):
+        for tid, refinds in self._refinds.items():
+            yield tid
+            for refind in refinds:
+                yield tid, refind
+
+    def __len__(self):
+        return len(self.texts) + sum(len(refinds) for refinds in self._refinds.values())
 
 
 def refind_map(tsvdir):
     """
     Map referent indices to dataset-unique integers.
+
+    :param tsvdir: Directory containing the TSV files of a corpus or a `TsvIndex` for it.
+    :return: `RefindMap`
     """
-    refinds = collections.OrderedDict()
-    for text in sorted(tsvdir.iterdir(), key=lambda p: p.stem):
-        tid = text.stem
-        if tid.endswith('_a') or tid.endswith('_b'):  # pragma: no cover
-            tid = tid[:-2]
-        tid = '_'.join(tid.split('_')[2:])
-        refs = {r['refind'] for r in reader(text, dicts=True, delimiter='\t') if r['refind']}
-        if tid in refinds:  # pragma: no cover
-            refinds[tid] |= refs
-        else:
-            refinds[tid] = refs
-    # Compute the number of digits we need for the "old" index.
-    try:
-        refind_length = len(str(max([int(s) for s in itertools.chain(*refinds.values())])))
-    except ValueError:  # pragma: no cover
-        refind_length = 0
-    res = {}
-    for i, (tid, ids) in enumerate(refinds.items(), start=1):
-        res[tid] = i
-        for refind in ids:
-            res[(tid, refind)] = (i * 10 ** refind_length) + int(refind)
-    return res
+    return RefindMap((tsvdir if isinstance(tsvdir, TsvIndex) else TsvIndex(tsvdir)).refinds())
 
 
 def parse_referent_relations(s):
@@ -116,32 +282,250 @@ def iter_referents(p, refind_map, log=None):
             yield row, relations
 
 
-def remap_refind(p, refind_map):
+class ReferentGraph:
+    """
+    The referents of a corpus and the relations between them, indexed for fast queries.
+
+    Relations `a < b` ("a is a set member of b") and `b > a` ("b includes a") are indexed as the
+    same relation between a set and its member, and `a M b` as relation between a part `a` and
+    the whole `b`. Queries take time proportional to the size of the result.
+
+    Utterances mentioning referents - needed for `clauses` - are only known to graphs loaded with
+    `from_cldf`, or to which they have been added via `add_mentions`, as done by
+    `Dataset.cmd_makecldf` for the graph of `Dataset.referent_graph`.
+
+    :ivar referents: `OrderedDict` mapping refinds to referent rows.
+    :ivar relations: `list` of `(relid, source, target, rel)` tuples between known referents.
+    :ivar skipped: `list` of relations with unknown referents.
+    :ivar with_mentions: Flag signaling whether mentions have been added.
+    """
+    def __init__(self, referents):
+        """
+        :param referents: Iterable of pairs `(row, relations)`, as yielded by `iter_referents`.
+        """
+        self.referents, self.relations, self.skipped = collections.OrderedDict(), [], []
+        self._members = collections.defaultdict(set)
+        self._sets = collections.defaultdict(set)
+        self._parts = collections.defaultdict(set)
+        self._wholes = collections.defaultdict(set)
+        # Utterances mentioning a referent are stored as keys of a `dict`, i.e. as ordered set.
+        self._mentions = collections.defaultdict(dict)
+        self.with_mentions = False
+        relations = []
+        for row, rels in referents:
+            self.referents[row['refind']] = row
+            relations.extend(rels)
+        for relid, source, target, rel in relations:
+            if source in self.referents and target in self.referents:
+                self.add_relation(relid, source, target, rel)
+            else:  # pragma: no cover
+                self.skipped.append((relid, source, target, rel))
+
+    @classmethod
+    def from_cldf(cls, cldf):
+        """
+        Load the graph - including the utterances mentioning referents - from a CLDF dataset.
+
+        :param cldf: `pycldf.Dataset`
+        """
+        res = cls(
+            (row, []) for row in (
+                dict(r, refind=int(r['refind']))
+                for r in cldf['referents.csv'] if r['refind'] != UNMARKED))
+        if 'referent_relations.csv' in cldf:
+            for r in cldf['referent_relations.csv']:
+                res.add_relation(
+                    r['ID'], int(r['Source_Referent_ID']), int(r['Target_Referent_ID']),
+                    r['Relation'])
+        res.with_mentions = True
+        for r in cldf['ExampleTable']:
+            res.add_mentions(
+                r['ID'], [int(ref) for ref in r.get('refind') or [] if ref != UNMARKED])
+        return res
+
+    def add_relation(self, relid, source, target, rel):
+        self.relations.append((relid, source, target, rel))
+        if rel == '<':
+            self._members[target].add(source)
+            self._sets[source].add(target)
+        elif rel == '>':
+            self._members[source].add(target)
+            self._sets[target].add(source)
+        elif rel == 'M':
+            self._parts[target].add(source)
+            self._wholes[source].add(target)
+
+    def add_mentions(self, utterance, refinds):
+        """
+        Index an utterance as mentioning the referents in `refinds`.
+        """
+        self.with_mentions = True
+        for refind in refinds:
+            self._mentions[refind][utterance] = None
+
+    @staticmethod
+    def _closure(index, refind):
+        res, todo = set(), [refind]
+        while todo:
+            for r in index.get(todo.pop(), ()):
+                if r not in res:
+                    res.add(r)
+                    todo.append(r)
+        res.discard(refind)
+        return res
+
+    def members(self, refind, transitive=False):
+        """
+        The set members of a referent - and, if `transitive`, their members, etc.
+        """
+        return self._closure(self._members, refind) if transitive \
+            else set(self._members.get(refind, ()))
+
+    def sets(self, refind, transitive=False):
+        """
+        The sets a referent is a member of.
+        """
+        return self._closure(self._sets, refind) if transitive \
+            else set(self._sets.get(refind, ()))
+
+    def parts(self, refind, transitive=False):
+        return self._closure(self._parts, refind) if transitive \
+            else set(self._parts.get(refind, ()))
+
+    def wholes(self, refind, transitive=False):
+        return self._closure(self._wholes, refind) if transitive \
+            else set(self._wholes.get(refind, ()))
+
+    def clauses(self, refind, subsets=True):
+        """
+        The utterances mentioning a referent - or, with `subsets`, any of its (transitive) members.
+
+        :return: `list` of utterance IDs, in the order in which they were added.
+        :raises ValueError: If no mentions have been added to the graph.
+        """
+        if not self.with_mentions:
+            raise ValueError('No utterances mentioning referents have been added to the graph')
+        refinds = [refind] + (sorted(self._closure(self._members, refind)) if subsets else [])
+        return list(dict.fromkeys(
+            utterance for r in refinds for utterance in self._mentions.get(r, ())))
+
+
+def remap_refind(p, refind_map, tsv_index=None, target=None):
     """
     Update refind indices in an annotation file according to refind_map.
 
     :param p:
     :param refind_map:
-    :return:
+    :param tsv_index: `TsvIndex` for the raw TSV files, used to skip files without refinds.
+    :param target: If a path is passed, the updated file is written to `target`, streaming the \
+    content of `p`, otherwise `p` is updated in place.
+    :return: For EAF files, the `EafDocument`, so that the parsed document can be re-used.
     """
     otid = '_'.join(p.stem.split('_')[2:])
     tid = otid[:-2] if otid.endswith('_a') or otid.endswith('_b') else otid
     if p.suffix == '.eaf':
+        if target:
+            eaf = EafDocument(p)
+            eaf.remap_refind(refind_map, tid)
+            eaf.write(target, newline='\n')
+            return eaf
         with updateable_xml(p, newline='\n') as xml:
-            eaf_remap_refind(xml, refind_map, tid)
+            eaf = EafDocument(xml)
+            eaf.remap_refind(refind_map, tid)
+        return eaf
     elif p.suffix == '.xml':
+        if target:
+            xml_copy(p, target, refind_map, tid)
+            return
         with updateable_xml(p, newline='\r\n') as xml:
             xml_remap_refind(xml, refind_map, tid)
     elif p.suffix == '.tsv':
-        rows = list(reader(p, dicts=True, delimiter='\t'))
-        with UnicodeWriter(p, delimiter='\t') as writer:
-            for i, row in enumerate(rows):
-                if i == 0:
-                    writer.writerow(row.keys())
-                try:
-                    row['refind'] = str(refind_map[tid, row['refind']] if row['refind'] else '')
-                except KeyError:  # pragma: no cover
-                    row['refind'] = str(refind_map[otid, row['refind']] if row['refind'] else '')
-                writer.writerow(row.values())
+        if tsv_index and p.name in tsv_index.files and not tsv_index.files[p.name].refinds:
+            if target:
+                shutil.copyfile(p, target)
+            return
+        # Refinds of all parts of a text are mapped for the text - unless only the part is known.
+        key = tid if tid in refind_map else otid
+        with replacing(target or p) as tmp:
+            remapped = False
+            with UnicodeWriter(tmp, delimiter='\t') as writer:
+                for i, row in enumerate(reader(p, delimiter='\t')):
+                    if i == 0:  # An empty file has no header - and nothing to rewrite.
+                        header, irefind = row, row.index('refind')
+                        writer.writerow(header)
+                        continue
+                    # Like `reader(p, dicts=True)`, we skip blank lines and pad short rows.
+                    if not row:
+                        continue
+                    row.extend([''] * (len(header) - len(row)))
+                    if row[irefind]:
+                        row[irefind] = str(refind_map[key, row[irefind]])
+                        remapped = True
+                    writer.writerow(row)
+            if not remapped:  # Nothing to rewrite.
+                if target:
+                    shutil.copyfile(p, tmp)
+                else:
+                    tmp.unlink()
     else:  # pragma: no cover
         raise ValueError(p.suffix)
+
+
+_REMAP_ARGS = None
+
+
+def _init_worker(refind_map, tsv_index):  # pragma: no cover
+    global _REMAP_ARGS
+    _REMAP_ARGS = (refind_map, tsv_index)
+
+
+def _remap(p, target, refind_map, tsv_index):
+    eaf = remap_refind(p, refind_map, tsv_index=tsv_index, target=target)
+    # Parsed EAF documents can't be passed between processes, but their orthography can.
+    return eaf.add_orthography() if eaf else None
+
+
+def _remap_in_worker(item):  # pragma: no cover
+    return _remap(*item, *_REMAP_ARGS)
+
+
+def remap_files(items, refind_map, tsv_index=None, workers=1, processes=False, log=None):
+    """
+    Update refind indices in many annotation files, possibly in parallel.
+
+    Files are remapped in a pool of `workers` threads - or processes, if `processes` is set. Since
+    the files are independent, the results do not depend on the order of completion. If
+    remapping fails for some files, all files are still processed, and the failure for the first
+    file in input order is raised - so errors are reported deterministically, too.
+
+    :param items: `list` of pairs `(path, target)` as accepted by `remap_refind`.
+    :return: `list` with the orthography (see `EafDocument.add_orthography`) for EAF files and \
+    `None` for other files - in the order of `items`.
+    """
+    if workers > 1 and len(items) > 1:
+        if processes:
+            executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=workers, initializer=_init_worker, initargs=(refind_map, tsv_index))
+            futures = [executor.submit(_remap_in_worker, item) for item in items]
+        else:
+            executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+            futures = [executor.submit(_remap, *item, refind_map, tsv_index) for item in items]
+        with executor:
+            concurrent.futures.wait(futures)
+    else:
+        futures = []
+        for item in items:
+            futures.append(concurrent.futures.Future())
+            try:
+                futures[-1].set_result(_remap(*item, refind_map, tsv_index))
+            except Exception as e:
+                futures[-1].set_exception(e)
+
+    errors = [(item[0], f.exception()) for item, f in zip(items, futures) if f.exception()]
+    if errors:
+        if log:
+            for p, e in errors:
+                log.error('remapping refinds failed for {}: {}'.format(p.name, e))
+        raise ValueError('remapping refinds failed for {} files, first: {}'.format(
+            len(errors), errors[0][0].name)) from errors[0][1]
+    return [f.result() for f in futures]
@@ -1,20 +1,34 @@
 import re
+import json
+import hashlib
 import pathlib
 import functools
 
 from clldutils.apilib import API
+from clldutils.jsonlib import load, dump
 from csvw.dsv import reader
 from pycldf.sources import Sources
 
 from .html import iter_corpus_metadata
-from .tex import iter_text_metadata
+from .tex import iter_text_metadata, index_corpora
 from .metadata import CorpusMetadata, repl_version, ReplaceReferences
+from .util import FileCache, replacing
 
 __all__ = ['MultiCast']
 PKG_DIR = pathlib.Path(__file__).parent
 
 
 class MultiCast(API):
+    """
+    API to access a local copy of the Multi-CAST data.
+
+    :param cache_dir: Directory to store the metadata cache in - defaults to `<repos>/.cache`. \
+    Pass `False` to disable caching.
+    """
+    def __init__(self, repos=None, cache_dir=None):
+        API.__init__(self, repos)
+        self.cache_dir = self.repos / '.cache' if cache_dir is None else cache_dir
+
     @functools.cached_property
     def data(self):
         return self.path('data')
@@ -39,30 +53,88 @@ class MultiCast(API):
     def corpora_tex(self):
         return self.docs / 'tex' / 'docs' / 'collection-overview' / 'sections' / 'corpora.tex'
 
+    @functools.cached_property
+    def corpus_sections(self):
+        return index_corpora(self.corpora_tex)
+
+    def text_metadata_tsv(self, version):
+        return self.docs / 'general' / 'metadata' / '{}__mc_metadata.tsv'.format(version)
+
     def text_metadata(self, version):
-        return reader(
-            self.docs / 'general' / 'metadata' / '{}__mc_metadata.tsv'.format(version),
-            delimiter='\t',
-            dicts=True)
+        return reader(self.text_metadata_tsv(version), delimiter='\t', dicts=True)
 
     @functools.cached_property
     def sources(self):
         return Sources.from_file(PKG_DIR / 'data' / 'sources.bib')
 
+    def citation_path(self, corpus):
+        return self.docs.joinpath('citations', 'mc_{}_citation.txt'.format(corpus))
+
     def citation(self, corpus, format='txt', version=None):
-        _, citation, bibtex = self.docs.joinpath(
-            'citations',
-            'mc_{}_citation.txt'.format(corpus)).read_text(encoding='utf8').split('\n\n')
+        _, citation, bibtex = self.citation_path(corpus).read_text(encoding='utf8').split('\n\n')
         if version:
             citation = repl_version(citation, version)
         if format == 'txt':
             return citation.strip()
         return bibtex.strip()  # pragma: no cover
 
+    def metadata_key(self, version, corpus, checksums):
+        """
+        Checksum over all inputs of the metadata of `corpus` - or of all corpora - in `version`.
+        """
+        paths = [
+            self.repos / 'index.html',
+            self.corpora_tex,
+            self.text_metadata_tsv(version),
+            PKG_DIR / 'data' / 'sources.bib',
+        ] + [self.citation_path(cid) for cid in ([corpus] if corpus else self.corpora)]
+        return hashlib.md5(json.dumps(
+            [version, corpus] + [[p.name, checksums.checksum(p)] for p in paths]).encode()
+        ).hexdigest()
+
     def metadata(self, version, corpus=None):
+        """
+        Metadata of `corpus` - or of all corpora - in `version`.
+
+        Results are cached in `cache_dir`, keyed by checksums of the input files, i.e. index.html,
+        corpora.tex, the metadata TSV of the version, the citation files and the bibliography.
+        Checksums are only re-computed for files with changed mtime.
+
+        :return: `CorpusMetadata` instance if `corpus` is specified, else `dict` mapping corpus \
+        IDs to `CorpusMetadata`.
+        """
         if version not in self.versions:
             raise ValueError('{} is not a valid version'.format(version))  # pragma: no cover
 
+        if self.cache_dir:
+            cache_path = self.cache_dir / 'metadata.json'
+            checksums = FileCache(path=self.cache_dir / 'metadata_inputs.json')
+            cache = load(cache_path) if cache_path.exists() else {}
+            key = self.metadata_key(version, corpus, checksums)
+            if key in cache:
+                res = cache[key]['corpora']
+            else:
+                res = self._metadata(version, corpus)
+                # Entries for earlier states of the inputs of the same version and corpus are stale.
+                cache = {k: v for k, v in cache.items() if v['id'] != [version, corpus]}
+                cache[key] = dict(id=[version, corpus], corpora=res)
+                if not self.cache_dir.exists():
+                    self.cache_dir.mkdir(parents=True)
+                with replacing(cache_path) as tmp:
+                    dump(cache, tmp, indent=2)
+            checksums.save()
+        else:
+            res = self._metadata(version, corpus)
+
+        res = {
+            cid: CorpusMetadata(**dict(d, sources=[self.sources[sid] for sid in d['sources']]))
+            for cid, d in res.items()}
+        return res if not corpus else res[corpus]
+
+    def _metadata(self, version, corpus=None):
+        """
+        Compute the metadata as JSON serializable `dict` - with sources referenced by ID.
+        """
         tmd = self.text_metadata(version)
         corpora_in_version = {r['corpus'] for r in tmd}
         if corpus:
@@ -73,15 +145,11 @@ class MultiCast(API):
         for cid in corpora_in_version:
             cmd = res[cid]
             cmd['texts'] = list(
-                iter_text_metadata(self.corpora_tex, self.text_metadata(version), cid, cmd))
+                iter_text_metadata(self.corpus_sections, self.text_metadata(version), cid, cmd))
             cmd['citation'] = self.citation(cid, version=version)
 
             desc_repl = ReplaceReferences()
             cmd['description'] = desc_repl.replace(cmd['description'])
-            cmd['sources'] = [
-                self.sources[sid] for sid in
-                sorted(desc_repl.references.union(cmd['sources']))]
+            cmd['sources'] = sorted(desc_repl.references.union(cmd['sources']))
             cmd['docs'] = desc_repl.pubs
-
-        res = {cid: CorpusMetadata(**d) for cid, d in res.items() if cid in corpora_in_version}
-        return res if not corpus else res[corpus]
+        return {cid: d for cid, d in res.items() if cid in corpora_in_version}
@@ -0,0 +1,328 @@
+"""
+Generate synthetic Multi-CAST data of configurable size, e.g. to benchmark the build pipeline.
+
+The generated directory has the layout of the Multi-CAST repository, i.e. it can be read with
+`MultiCast` and used to seed a CLDF dataset with `multicast cldfbench`. The XML, EAF and TSV files
+of a text contain the same units and segments, and the list of referents describes exactly the
+referents indexed in the annotations.
+"""
+import wave
+import random
+import itertools
+import pathlib
+
+import attr
+from lxml.etree import Element, SubElement, tostring
+from csvw.dsv import UnicodeWriter
+
+__all__ = ['make_repos']
+
+WORDS = [
+    ('ka', 'DEF'), ('na-', 'see-'), ('mo', 'go'), ('ri=', 'LOC='), ('tal', 'house'),
+    ('=ne', '=PL'), ('ve-', 'NUM-'), ('wal', 'one'), ('su', 'come'), ('lak', 'canoe'),
+]
+GRAIDS = ['np.h:s', 'np:a', 'pro.h:s', '0.h:a', 'np:p', 'np:obl', 'v:pred', 'nc']
+ISNREFS = ['new', 'giv', 'acc', 'bridge']
+CLASSES = ['hum', 'anm', 'inm', 'loc']
+
+
+@attr.s
+class Segment:
+    gword = attr.ib()
+    gloss = attr.ib()
+    graid = attr.ib()
+    refind = attr.ib(default=None)
+    isnref = attr.ib(default=None)
+
+
+@attr.s
+class Unit:
+    uid = attr.ib()
+    start = attr.ib()
+    end = attr.ib()
+    segments = attr.ib()
+
+    @property
+    def utterance(self):
+        return ' '.join(s.gword for s in self.segments)
+
+    @property
+    def orthography(self):
+        return self.utterance.upper()
+
+    @property
+    def translation(self):
+        return 'Translation of unit {}.'.format(self.uid)
+
+
+def _units(rng, n_units, n_segments, n_referents):
+    units, end = [], 0
+    for i in range(1, n_units + 1):
+        segments = []
+        for _ in range(n_segments):
+            gword, gloss = rng.choice(WORDS)
+            s = Segment(gword, gloss, rng.choice(GRAIDS))
+            if s.graid != 'nc' and n_referents:
+                s.refind = '{:04}'.format(rng.randint(1, n_referents))
+                s.isnref = rng.choice(ISNREFS)
+            segments.append(s)
+        start = end + rng.randint(10, 500)
+        end = start + rng.randint(1000, 5000)
+        units.append(Unit('{:04}'.format(i), start, end, segments))
+    return units
+
+
+def _write(e, p, newline='\n'):
+    with p.open('w', encoding='utf8', newline=newline) as fp:
+        fp.write('<?xml version="1.0" encoding="UTF-8"?>\n{}'.format(
+            tostring(e, pretty_print=True, encoding=str)))
+
+
+def write_xml(p, corpus, tid, units, version):
+    root = Element('multicast', version=version)
+    text = SubElement(
+        SubElement(root, 'corpus', c_name=corpus), 'text', t_name=tid, speaker='SP01')
+    file = SubElement(text, 'file', f_name=p.stem, audio='{}.wav'.format(p.stem))
+    for u in units:
+        unit = SubElement(file, 'unit', uid=u.uid, start_time=str(u.start), end_time=str(u.end))
+        for tag, value in [
+            ('utterance_id', '{}_{}_{}'.format(corpus, tid, u.uid)),
+            ('utterance', u.utterance),
+            ('utterance_translation', u.translation),
+            ('add_orthography', u.orthography),
+        ]:
+            SubElement(unit, tag).text = value
+        annotations = SubElement(unit, 'annotations')
+        for s in u.segments:
+            segment = SubElement(annotations, 'segment')
+            for tag in ['gword', 'gloss', 'graid', 'refind', 'isnref']:
+                if getattr(s, tag):
+                    SubElement(segment, tag).text = getattr(s, tag)
+    _write(root, p, newline='\r\n')
+
+
+def write_eaf(p, corpus, tid, units):
+    root = Element('ANNOTATION_DOCUMENT', FORMAT='2.8', VERSION='2.8')
+    header = SubElement(root, 'HEADER', MEDIA_FILE='', TIME_UNITS='milliseconds')
+    SubElement(
+        header, 'MEDIA_DESCRIPTOR', MEDIA_URL='{}.wav'.format(p.stem), MIME_TYPE='audio/x-wav')
+    time_order = SubElement(root, 'TIME_ORDER')
+    ids = itertools.count(1)
+
+    def tier(name, type_, parent=None):
+        t = SubElement(root, 'TIER', LINGUISTIC_TYPE_REF=type_, PARTICIPANT='SP01', TIER_ID=name)
+        if parent:
+            t.set('PARENT_REF', parent)
+        return t
+
+    def ref_annotation(t, ref, value):
+        aid = 'a{}'.format(next(ids))
+        a = SubElement(
+            SubElement(t, 'ANNOTATION'), 'REF_ANNOTATION', ANNOTATION_ID=aid, ANNOTATION_REF=ref)
+        SubElement(a, 'ANNOTATION_VALUE').text = value
+        return aid
+
+    uid_tier = tier('utterance_id', 'time_alignment')
+    utt_tier = tier('utterance', 'symbolic_association', 'utterance_id')
+    orth_tier = tier('add_orthography', 'symbolic_association', 'utterance')
+    tiers = {
+        name: tier(name, type_, parent) for name, type_, parent in [
+            ('grammatical_words', 'symbolic_subdivision', 'utterance'),
+            ('gloss', 'symbolic_association', 'grammatical_words'),
+            ('graid', 'symbolic_association', 'gloss'),
+            ('refind', 'symbolic_association', 'graid'),
+            ('isnref', 'symbolic_association', 'refind'),
+        ]}
+    trans_tier = tier('utterance_translation', 'symbolic_association', 'utterance')
+    for i, u in enumerate(units, start=1):
+        for j, value in enumerate([u.start, u.end]):
+            SubElement(
+                time_order,
+                'TIME_SLOT',
+                TIME_SLOT_ID='ts{}'.format(2 * i - 1 + j),
+                TIME_VALUE=str(value))
+        aid = 'a{}'.format(next(ids))
+        a = SubElement(
+            SubElement(uid_tier, 'ANNOTATION'),
+            'ALIGNABLE_ANNOTATION',
+            ANNOTATION_ID=aid,
+            TIME_SLOT_REF1='ts{}'.format(2 * i - 1),
+            TIME_SLOT_REF2='ts{}'.format(2 * i))
+        SubElement(a, 'ANNOTATION_VALUE').text = '{}_{}_{}'.format(corpus, tid, u.uid)
+        utt = ref_annotation(utt_tier, aid, u.utterance)
+        ref_annotation(orth_tier, utt, u.orthography)
+        for s in u.segments:
+            ref = utt
+            for name, value in [
+                ('grammatical_words', s.gword),
+                ('gloss', s.gloss),
+                ('graid', s.graid),
+                ('refind', s.refind),
+                ('isnref', s.isnref),
+            ]:
+                if value is None:
+                    break
+                ref = ref_annotation(tiers[name], ref, value)
+        ref_annotation(trans_tier, utt, u.translation)
+    for type_, time_alignable, constraints in [
+        ('time_alignment', 'true', None),
+        ('symbolic_association', 'false', 'Symbolic_Association'),
+        ('symbolic_subdivision', 'false', 'Symbolic_Subdivision'),
+    ]:
+        lt = SubElement(
+            root,
+            'LINGUISTIC_TYPE',
+            GRAPHIC_REFERENCES='false',
+            LINGUISTIC_TYPE_ID=type_,
+            TIME_ALIGNABLE=time_alignable)
+        if constraints:
+            lt.set('CONSTRAINTS', constraints)
+    _write(root, p)
+
+
+def write_tsv(p, corpus, tid, units):
+    with UnicodeWriter(p, delimiter='\t') as w:
+        w.writerow(
+            'corpus text uid gword gloss graid gform ganim gfunc refind isnref'.split())
+        for u in units:
+            for s in u.segments:
+                gform, _, gfunc = s.graid.partition(':')
+                gform, _, ganim = gform.partition('.')
+                w.writerow([
+                    corpus, tid, u.uid, s.gword, s.gloss, s.graid, gform, ganim, gfunc,
+                    s.refind or '', s.isnref or ''])
+
+
+def write_wav(p, duration, framerate=1000):
+    """
+    Write a silent mono WAV file.
+
+    :param duration: Duration in milliseconds.
+    """
+    with wave.open(str(p), 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(1)
+        f.setframerate(framerate)
+        f.writeframes(b'\x80' * (duration * framerate // 1000))
+
+
+def make_repos(
+        d,
+        corpus='synth',
+        version='2401',
+        texts=10,
+        units=50,
+        segments=8,
+        referents=20,
+        audio=True,
+        seed=1,
+):
+    """
+    Write a synthetic Multi-CAST repository with one corpus of `texts` texts with `units` units
+    of `segments` segments each, referring to `referents` referents per text.
+
+    :param audio: Flag signaling whether to write (silent) WAV files for the texts.
+    :return: `pathlib.Path` of the repository.
+    """
+    rng = random.Random(seed)
+    d = pathlib.Path(d)
+    data, docs = d / 'data' / version / corpus, d / 'data' / 'docs'
+    for subdir in [
+        data / 'xml',
+        data / 'eaf',
+        data / 'tsv',
+        d / 'data' / 'audio' / corpus / 'wav',
+        d / 'images',
+        docs / 'citations',
+        docs / 'general' / 'metadata',
+        docs / 'tex' / 'docs' / 'collection-overview' / 'sections',
+        docs / 'corpora' / 'list-of-referents' / corpus / 'tsv',
+    ]:
+        subdir.mkdir(parents=True, exist_ok=True)
+
+    tids = ['text{}'.format(i) for i in range(1, texts + 1)]
+    with UnicodeWriter(
+            docs.joinpath(
+                'corpora', 'list-of-referents', corpus, 'tsv',
+                'mc_{}_list-of-referents.tsv'.format(corpus)),
+            delimiter='\t') as referents_tsv:
+        referents_tsv.writerow(
+            'corpus text refind label description class relations notes'.split())
+        for tid in tids:
+            stem = 'mc_{}_{}'.format(corpus, tid)
+            text_units = _units(rng, units, segments, referents)
+            write_xml(data / 'xml' / '{}.xml'.format(stem), corpus, tid, text_units, version)
+            write_eaf(data / 'eaf' / '{}.eaf'.format(stem), corpus, tid, text_units)
+            write_tsv(data / 'tsv' / '{}.tsv'.format(stem), corpus, tid, text_units)
+            if audio:
+                write_wav(
+                    d / 'data' / 'audio' / corpus / 'wav' / '{}.wav'.format(stem),
+                    text_units[-1].end + 1000)
+
+            used = sorted({s.refind for u in text_units for s in u.segments if s.refind})
+            for refind in used:
+                others = [r for r in used if r != refind]
+                relations, description = '', 'referent {}'.format(refind)
+                if others and rng.random() < 0.3:
+                    relations = '> {}; < {}'.format(
+                        ', '.join(rng.sample(others, min(2, len(others)))), rng.choice(others))
+                if others and rng.random() < 0.2:
+                    description += ', friend of {}'.format(rng.choice(others))
+                referents_tsv.writerow([
+                    corpus, tid, refind, 'ref{}'.format(refind), description,
+                    rng.choice(CLASSES), relations, ''])
+
+    with UnicodeWriter(
+            docs / 'general' / 'metadata' / '{}__mc_metadata.tsv'.format(version),
+            delimiter='\t') as w:
+        w.writerow('corpus text type recorded speaker gender age born'.split())
+        for tid in tids:
+            age = rng.randint(20, 80)
+            w.writerow([
+                corpus, tid, 'TN', '2015', 'SP01', rng.choice(['male', 'female']),
+                'c{}'.format(age), 'c{}'.format(2015 - age)])
+
+    citation = 'Doe, Jane. 2024. Multi-CAST Synthetic. In Haig, Geoffrey & Schnell, Stefan ' \
+               '(eds.), Multi-CAST: Multilingual corpus of annotated spoken texts. Version {}. ' \
+               'Bamberg: University of Bamberg.'.format(version)
+    docs.joinpath('citations', 'mc_{}_citation.txt'.format(corpus)).write_text(
+        'Cite this Multi-CAST data set as:\n\n{}\n\n@misc{{Doe2024,\n title = {{Synthetic}}\n}}'
+        .format(citation), encoding='utf8')
+    paragraphs = '\n'.join('\\paragraph{{{0}}}\nThe text {0}.'.format(tid) for tid in tids)
+    docs.joinpath(
+        'tex', 'docs', 'collection-overview', 'sections', 'corpora.tex').write_text("""\
+\\subsection{{Synthetic}}
+\\label{{ssec:corpus-{0}}}
+
+\\begin{{description}}
+    \\item[affiliation] Synthetic
+    \\item[area spoken] Nowhere
+    \\item[varieties rec'd] Synthetic
+    \\item[sources] \\bcite{{Schnell2010}}
+\\end{{description}}
+
+A synthetic corpus.
+
+\\subsubsection*{{Background to the recordings}}
+{1}
+
+\\subsection{{Other}}
+\\label{{ssec:corpus-other}}
+""".format(corpus, paragraphs), encoding='utf8')
+    d.joinpath('index.html').write_text("""\
+<html><body>
+<section>
+<div class="anchor" id="{0}"></div>
+<h1>Synthetic <span>[{0}]</span></h1>
+<h4>Jane Doe</h4>
+<div class="block">
+<p><strong>Synthetic</strong> (<span class="iso"><a href="#">vera1241</a></span>) is made up.</p>
+</div>
+<div class="block">
+<div class="corpusimage"><img src="images/mc_{0}.jpg"/><span>No image.</span></div>
+</div>
+</section>
+</body></html>
+""".format(corpus), encoding='utf8')
+    d.joinpath('images', 'mc_{}.jpg'.format(corpus)).write_bytes(b'')
+    return d
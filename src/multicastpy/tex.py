@@ -1,108 +1,164 @@
+import re
+
+import attr
 from TexSoup import TexSoup
 
-__all__ = ['iter_text_metadata']
+__all__ = ['iter_text_metadata', 'index_corpora', 'CorpusSection']
 
+LABEL = re.compile(r'\\label\{(?P<label>[^}]*)}')
+SUBSUBSECTION = re.compile(r'\\subsubsection\*?\{(?P<title>[^}]*)}')
+ITEM = re.compile(r'\\item\[(?P<key>[^]]*)]')
+GLOBAL_ITEMS = {
+    'affiliation': 'affiliation', 'area spoken': 'areas', "varieties rec'd": 'varieties'}
 
-def iter_text_metadata(tex, tsv, corpus, globalmd):
-    r"""
-    Side effect: some corpus-level metadata is parsed "on the side" and assigned to globalmd.
 
-    \label{ssec:corpus-kalamang}
+@attr.s
+class CorpusSection:
+    """
+    The fragments of the section describing a corpus in corpora.tex, which we extract metadata
+    from:
 
-    \item[sources]>->-------\bcite{Kimoto2017}, \ycite{Kimoto2018}
+    - `itemize`: Lines of the itemize environment(s) listing the texts with their local IDs and
+      titles.
+    - `items`: Lines of the description environment with the relevant corpus-level metadata,
+      keyed by item label.
+    - `descriptions`: Text descriptions in the "Background to the recordings" subsection, keyed
+      by text ID.
+    """
+    id = attr.ib()
+    itemize = attr.ib(default=attr.Factory(list))
+    items = attr.ib(default=attr.Factory(dict))
+    descriptions = attr.ib(default=attr.Factory(dict))
 
-    \begin{itemize} -> text metadata
+    def metadata(self):
+        """
+        Corpus-level metadata.
+        """
+        res = dict(sources=[])
+        for key, line in self.items.items():
+            line = TexSoup(line)
+            if key == 'sources':
+                for dd in line.descendants:
+                    name = getattr(dd, 'name', '')
+                    if name.endswith('cite'):
+                        for sid in dd.string.split(','):
+                            res['sources'].append(sid.strip().lower())
+            else:
+                res[GLOBAL_ITEMS[key]] = ''.join(line.text[1:]).strip()
+        return res
+
+    def texts(self):
+        """
+        :return: `dict` mapping text IDs to pairs `(local ID, title)`.
+        """
+        res = {}
+        if self.itemize:
+            itemize = TexSoup('\n'.join(self.itemize))
+            for item in itemize.itemize.contents:
+                if item.tit:
+                    tid = str(item.text[0])
+                    rem = TexSoup(str(item).split('tab')[1].strip().split(r'\\\hspace')[0])
+                    lid = str(rem.tit.string) if rem.tit else None
+                    lname = str(rem.sqt.string) if rem.sqt else None
+                    res[tid] = (lid.replace(r'\_', '_') if lid else lid, lname)
+        return res
 
-    \subsubsection*{Background to the recordings}
-    \paragraph{alisiya} -> text descriptions
-    ...
-    \subsection ... -> stop!
-    """
-    tsvmd = {}
-    for i, row in enumerate(tsv):
-        if row['corpus'] == corpus:
-            tsvmd[row['text']] = {k: v for k, v in row.items() if k not in ['corpus', 'text']}
 
+def index_corpora(tex):
+    r"""
+    Split corpora.tex into the sections for individual corpora - in one pass over the file.
+
+    A section starts with `\label{ssec:corpus-<ID>}` and ends with the next label, or with the
+    first command other than `\paragraph` within the "Background to the recordings" subsection.
+
+    :return: `dict` mapping corpus IDs to `CorpusSection` instances.
+    """
     lines = [li.split('%')[0].strip() for li in tex.read_text(encoding='utf8').split('\n')]
-    lines = [li for li in lines if li]
-    in_section, in_subsection, in_itemize, in_description = False, False, False, False
-    tids, text, itemize, sources = None, [], [], []
-    res = {}
-    for line in lines:
-        if in_subsection:
-            if line[0].replace('\\', '?') == '?':
+    res, section, in_background, in_itemize, in_description = {}, None, False, False, False
+    tids, text = None, []
+
+    def flush_description():
+        if tids and text:
+            for tid in tids:
+                section.descriptions[tid] = '\n'.join(text)
+
+    for line in filter(None, lines):
+        if in_background:
+            if line.startswith('\\'):
+                flush_description()
                 if 'paragraph' in line:
-                    if tids and text:
-                        for tid in tids:
-                            res[tid] = '\n'.join(text)
                     tids = [s.strip() for s in TexSoup(line).paragraph.string.split(',')]
                     text = []
-                else:
-                    break
+                    continue
+                section, in_background = None, False
             else:
                 text.append(line)
-            continue
-        if in_section:
+                continue
+        if section:
             if 'subsubsection' in line:
-                line = TexSoup(line.replace('*', ''))
-                if line.subsubsection.string == 'Background to the recordings':
-                    in_subsection = True
+                m = SUBSUBSECTION.search(line)
+                if m and m.group('title') == 'Background to the recordings':
+                    in_background, tids, text = True, None, []
                     continue
             if 'itemize' in line and ('begin' in line):
                 in_itemize = True
             if in_itemize:
-                itemize.append(line)
+                section.itemize.append(line)
                 if 'itemize' in line and ('end' in line):
                     in_itemize = False
             if in_description:
                 if 'description' in line and ('end' in line):
                     in_description = False
                 else:
-                    line = TexSoup(line)
-                    if line.item:
-                        if line.item.string == 'sources':
-                            for dd in line.descendants:
-                                name = getattr(dd, 'name', '')
-                                if name.endswith('cite'):
-                                    for sid in dd.string.split(','):
-                                        sources.append(sid.strip().lower())
-                        elif line.item.string == 'affiliation':
-                            globalmd['affiliation'] = ''.join(line.text[1:]).strip()
-                        elif line.item.string == 'area spoken':
-                            globalmd['areas'] = ''.join(line.text[1:]).strip()
-                        elif line.item.string == "varieties rec'd":
-                            globalmd['varieties'] = ''.join(line.text[1:]).strip()
-
+                    m = ITEM.search(line)
+                    if m and (m.group('key') == 'sources' or m.group('key') in GLOBAL_ITEMS):
+                        section.items[m.group('key')] = line
             if 'description' in line and ('begin' in line):
                 in_description = True
         if 'label' in line:
-            try:
-                line = TexSoup(line)
-                if line.label:
-                    if line.label.string.strip() == 'ssec:corpus-{}'.format(corpus):
-                        in_section = True
-                    elif in_section:
-                        in_section = False
-            except EOFError:
-                pass
-    if tids and text:
-        for tid in tids:
-            res[tid] = '\n'.join(text)
-    res2 = {}
-    if itemize:
-        itemize = TexSoup('\n'.join(itemize))
-        for item in itemize.itemize.contents:
-            if item.tit:
-                tid = item.text[0]
-                rem = TexSoup(str(item).split('tab')[1].strip().split(r'\\\hspace')[0])
-                lid = rem.tit.string if rem.tit else None
-                lname = rem.sqt.string if rem.sqt else None
-                res2[tid] = (lid.replace(r'\_', '_') if lid else lid, lname)
-    globalmd['sources'] = sources
+            m = LABEL.search(line)
+            if m:
+                label = m.group('label').strip()
+                if label.startswith('ssec:corpus-'):
+                    section = res[label[12:]] = CorpusSection(id=label[12:])
+                    in_itemize, in_description = False, False
+                else:
+                    section = None
+    if in_background:
+        flush_description()
+    return res
+
+
+def iter_text_metadata(tex, tsv, corpus, globalmd):
+    r"""
+    Side effect: some corpus-level metadata is parsed "on the side" and assigned to globalmd.
+
+    \label{ssec:corpus-kalamang}
+
+    \item[sources]>->-------\bcite{Kimoto2017}, \ycite{Kimoto2018}
+
+    \begin{itemize} -> text metadata
+
+    \subsubsection*{Background to the recordings}
+    \paragraph{alisiya} -> text descriptions
+    ...
+    \subsection ... -> stop!
+
+    :param tex: Path of corpora.tex or the result of `index_corpora` for it.
+    """
+    tsvmd = {}
+    for i, row in enumerate(tsv):
+        if row['corpus'] == corpus:
+            tsvmd[row['text']] = {k: v for k, v in row.items() if k not in ['corpus', 'text']}
+
+    sections = tex if isinstance(tex, dict) else index_corpora(tex)
+    section = sections.get(corpus, CorpusSection(id=corpus))
+    globalmd.update(section.metadata())
+    texts = section.texts()
     for tid, md in tsvmd.items():
         yield dict(
             id=tid,
-            local_id=res2.get(tid, (None, None))[0],
-            title=res2.get(tid, (None, None))[1],
-            description=res.get(tid),
+            local_id=texts.get(tid, (None, None))[0],
+            title=texts.get(tid, (None, None))[1],
+            description=section.descriptions.get(tid),
             **md)
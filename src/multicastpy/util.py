@@ -1,6 +1,17 @@
+import re
+import os
+import uuid
+import shutil
+import pathlib
+import contextlib
 import subprocess
+import collections
 
-__all__ = ['rmdir', 'is_same']
+from clldutils.path import md5
+from clldutils.jsonlib import load, dump
+
+__all__ = ['rmdir', 'is_same', 'text_id', 'replacing', 'FileCache', 'FileIndex']
+TEXT_FILE = re.compile(r'mc_[a-z]+_.+')
 
 
 def rmdir(p):
@@ -20,3 +31,148 @@ def is_same(d1, d2):
         return True
     except subprocess.CalledProcessError:
         return False
+
+
+@contextlib.contextmanager
+def replacing(p):
+    """
+    Context manager to write a file atomically.
+
+    Yields the path of a temporary file in the directory of `p`. When the block is left without
+    error, the temporary file - if it has not been removed within the block - replaces `p`.
+    Otherwise it is removed.
+    """
+    p = pathlib.Path(p)
+    tmp = p.parent / '.{}.{}'.format(p.name, uuid.uuid4().hex)
+    try:
+        yield tmp
+        if tmp.exists():
+            if p.exists():
+                shutil.copymode(str(p), str(tmp))
+            os.replace(str(tmp), str(p))
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+
+
+def text_id(p):
+    """
+    Text ID of a Multi-CAST file with name `mc_<corpus>_<text>[_a|_b].<suffix>`.
+    """
+    tid = '_'.join(p.stem.split('_')[2:])
+    return tid[:-2] if tid.endswith('_a') or tid.endswith('_b') else tid
+
+
+class FileIndex:
+    """
+    Index of the files in a directory and its immediate subdirectories, with stat results.
+
+    The index is built with one `os.scandir` call per directory; afterwards, looking up files
+    and their sizes - or the files belonging to a text - are dictionary lookups.
+    """
+    def __init__(self, d):
+        self.dir = pathlib.Path(d)
+        self.stats = {}
+        self.texts = collections.defaultdict(list)
+        if self.dir.exists():
+            self._scan(self.dir, subdirs=True)
+
+    def _scan(self, d, subdirs=False):
+        with os.scandir(d) as entries:
+            for e in entries:
+                if e.is_dir():
+                    if subdirs:
+                        self._scan(d / e.name)
+                else:
+                    self.add(d / e.name, e.stat())
+
+    def add(self, p, stat=None):
+        if p not in self.stats and TEXT_FILE.fullmatch(p.name):
+            self.texts[text_id(p)].append(p)
+        self.stats[p] = stat or p.stat()
+
+    def unlink(self, p):
+        del self.stats[p]
+        if TEXT_FILE.fullmatch(p.name):
+            self.texts[text_id(p)].remove(p)
+        p.unlink()
+
+    def __contains__(self, p):
+        return p in self.stats
+
+    def __iter__(self):
+        return iter(list(self.stats))
+
+    def stat(self, p):
+        return self.stats[p] if p in self.stats else p.stat()
+
+    def size(self, p):
+        return self.stats[p].st_size
+
+    def files(self, subdir, suffixes=None):
+        d = self.dir / subdir
+        return sorted(
+            p for p in self.stats
+            if p.parent == d and (suffixes is None or p.suffix in suffixes))
+
+    def parts(self, tid, suffix, subdir=None):
+        """
+        The files of a text - possibly split into several parts - with the given suffix.
+        """
+        d = self.dir / subdir if subdir else self.dir
+        return sorted(p for p in self.texts.get(tid, []) if p.suffix == suffix and p.parent == d)
+
+
+class FileCache:
+    """
+    A persistent cache of data computed from files.
+
+    Entries are keyed by file name and are valid as long as size and mtime of the file did not
+    change - or, if only the mtime changed, as long as the md5 checksum is the same.
+
+    :param stat: Callable returning the stat result for a path, e.g. `FileIndex.stat`.
+    """
+    def __init__(self, path=None, stat=None):
+        self.path = path
+        self.entries = load(path) if path and path.exists() else {}
+        self.changed = False
+        self.stat = stat or (lambda p: p.stat())
+
+    def _entry(self, p):
+        entry, stat = self.entries.get(p.name), self.stat(p)
+        if entry and entry['size'] == stat.st_size:
+            if entry['mtime'] == stat.st_mtime_ns:
+                return entry
+            if entry['md5'] == md5(p):
+                entry['mtime'] = stat.st_mtime_ns
+                self.changed = True
+                return entry
+        return None
+
+    def get(self, p):
+        entry = self._entry(p)
+        return entry.get('value') if entry else None
+
+    def set(self, p, value, checksum=None):
+        stat = self.stat(p)
+        self.entries[p.name] = dict(
+            size=stat.st_size, mtime=stat.st_mtime_ns, md5=checksum or md5(p), value=value)
+        self.changed = True
+
+    def checksum(self, p):
+        """
+        The md5 checksum of a file - only computed if the file changed.
+        """
+        entry = self._entry(p)
+        if entry:
+            return entry['md5']
+        checksum = md5(p)
+        self.set(p, None, checksum=checksum)
+        return checksum
+
+    def save(self):
+        if self.path and self.changed:
+            if not self.path.parent.exists():
+                self.path.parent.mkdir(parents=True)
+            dump(self.entries, self.path, indent=2)
+            self.changed = False
@@ -1,14 +1,28 @@
-import functools
+import sys
+import copy
+import filecmp
+import pathlib
 import itertools
 import contextlib
 import collections
 
-from lxml.etree import parse, tostring
-from pyigt import IGT
+from lxml.etree import parse, iterparse, xmlfile, XPath
+from pyigt import IGT, LGRConformance
 from pyigt.lgrmorphemes import MORPHEME_SEPARATORS
 
-__all__ = ['UNMARKED', 'updateable_xml', 'get_file', 'text', 'remap_refind']
+from .igt import conformance
+from .util import replacing
+
+__all__ = [
+    'UNMARKED', 'updateable_xml', 'dump_xml', 'stream_xml', 'get_file', 'text', 'remap_refind',
+    'copy_remapped']
 UNMARKED = '∅'
+XML_DECLARATION = b'<?xml version="1.0" encoding="UTF-8"?>\n'
+TIERS = ('gword', 'gloss', 'graid', 'refind', 'isnref')
+FIELDS = ('utterance_id', 'utterance', 'utterance_translation', 'add_orthography', 'add_comments')
+# Compiled once, rather than each time an expression is evaluated:
+SEGMENTS = XPath('annotations/segment')
+CHILD_NODES = XPath('child::node()')
 
 
 def iter_words(chunks1, chunks2):
@@ -41,28 +55,214 @@ def iter_words(chunks1, chunks2):
         yield word, gloss
 
 
+class _NewlineWriter:
+    def __init__(self, fp, newline):
+        self.fp, self.newline = fp, newline.encode('ascii')
+
+    def write(self, data):
+        self.fp.write(data.replace(b'\n', self.newline) if self.newline != b'\n' else data)
+
+
+def _dump(d, fp, newline):
+    out = _NewlineWriter(fp, newline)
+    out.write(XML_DECLARATION)
+    with xmlfile(out, encoding='UTF-8') as xf:
+        xf.write(d, pretty_print=True)
+
+
+def dump_xml(d, target, newline='\n'):
+    """
+    Write an XML document to `target`, serialized in the same way as by `updateable_xml`.
+    """
+    with pathlib.Path(target).open('wb') as fp:
+        _dump(d, fp, newline)
+
+
 @contextlib.contextmanager
 def updateable_xml(p, newline='\n'):
-    d = parse(p).getroot()
+    """
+    Context manager to update an XML document in place.
+
+    When the block is left without error, the document is serialized directly to a temporary file,
+    which then replaces the original file atomically - unless its content is the same, in which
+    case the original file is left untouched.
+    """
+    p = pathlib.Path(p)
+    d = parse(str(p)).getroot()
+    yield d
+    with replacing(p) as tmp:
+        dump_xml(d, tmp, newline=newline)
+        if filecmp.cmp(str(tmp), str(p), shallow=False):
+            tmp.unlink()
+
+
+def _indent(level):
+    # libxml2 indents by two spaces per level, up to a maximal indentation of 60 spaces.
+    return '  ' * min(level, 30)
+
+
+def _pretty_print(e, level):
+    """
+    Insert the whitespace into the tree of `e`, which libxml2 adds when pretty printing `e` at
+    `level`: The children of an element are put on separate, indented lines - unless the element
+    contains text, including whitespace.
+    """
+    children = list(e)
+    if not children or e.text is not None or any(c.tail is not None for c in children):
+        return
+    e.text = '\n' + _indent(level + 1)
+    for c in children:
+        c.tail = '\n' + _indent(level + 1)
+        _pretty_print(c, level + 1)
+    children[-1].tail = '\n' + _indent(level)
+
+
+class _MixedContent(Exception):
+    """
+    Raised when text follows a child of a container, for which we already wrote the whitespace
+    of pretty printing.
+    """
+
+
+def stream_xml(src, target, record_depth, transform=None, newline='\n'):
+    """
+    Copy an XML document from `src` to `target`, passing elements at `record_depth` through
+    `transform`.
+
+    The document is read with `iterparse` and written with `xmlfile` one record at a time, and
+    records are discarded once written; so memory use is bounded by the size of the largest record
+    rather than the size of the document. The output is serialized in the same way as by
+    `dump_xml`, i.e. comments and processing instructions are kept within the root element only,
+    and elements without text content are pretty printed. (If a container element has text after
+    a child, but not before its first child, we can only decide how to serialize it when it is too
+    late. Such documents are copied via a parsed tree instead.)
+    """
     try:
-        yield d
-    finally:
-        with p.open('w', encoding='utf8', newline=newline) as fp:
-            fp.write('<?xml version="1.0" encoding="UTF-8"?>\n{}'.format(
-                tostring(d, pretty_print=True, encoding=str)))
+        with target.open('wb') as fp:
+            _stream_xml(src, fp, record_depth, transform, newline)
+    except _MixedContent:
+        d = parse(str(src)).getroot()
+        if transform:
+            for e in d.xpath('/'.join(['*'] * record_depth)):
+                transform(e)
+        dump_xml(d, target, newline=newline)
+
+
+def _stream_xml(src, fp, record_depth, transform, newline):
+    out = _NewlineWriter(fp, newline)
+    out.write(XML_DECLARATION)
+    with xmlfile(out, encoding='UTF-8') as xf:
+        # Start tags of container elements are only written once we know the element has
+        # children, because childless elements must be serialized as a whole. Then we also know
+        # whether the children are pretty printed. Thus, the stack holds triples
+        # [element, context manager of the start tag, whether children are pretty printed].
+        stack, tail, record = [], None, None
+
+        def flush_tail():
+            nonlocal tail
+            if tail is not None:
+                node, pretty = tail
+                if pretty:
+                    if node.tail is not None:
+                        raise _MixedContent()
+                    xf.write('\n')
+                elif node.tail:
+                    xf.write(node.tail)
+            tail = None
+
+        def write_element(e):
+            # A copy of an element only declares the namespaces it actually uses, while the
+            # element itself would re-declare all namespaces declared on the root.
+            xf.write(copy.deepcopy(e) if e.nsmap else e, with_tail=False)
+
+        def open_parent():
+            entry = stack[-1]
+            if entry[1] is None:
+                e = entry[0]
+                entry[1] = xf.element(
+                    e.tag, dict(e.attrib), nsmap=e.nsmap if len(stack) == 1 else None)
+                entry[1].__enter__()
+                # The root element is pretty printed, and so are the children of pretty printed
+                # elements without text.
+                entry[2] = (len(stack) == 1 or stack[-2][2]) and e.text is None
+                if entry[2]:
+                    xf.write('\n')
+                elif e.text:
+                    xf.write(e.text)
+            if entry[2]:
+                xf.write(_indent(len(stack)))
+            return entry[2]
+
+        for event, e in iterparse(
+                str(src), events=('start', 'end', 'comment', 'pi'), remove_comments=False):
+            if record is not None:
+                if event == 'end' and e is record:
+                    if transform:
+                        transform(e)
+                    if stack[-1][2]:
+                        _pretty_print(e, record_depth)
+                    write_element(e)
+                    # Discard previously written siblings:
+                    while e.getprevious() is not None:
+                        del e.getparent()[0]
+                    tail, record = (e, stack[-1][2]), None
+                    e.clear(keep_tail=True)
+                continue
+            if event in ('comment', 'pi'):
+                if stack:  # Like `dump_xml`, we drop nodes outside of the root element.
+                    flush_tail()
+                    pretty = open_parent()
+                    xf.write(e, with_tail=False)
+                    tail = (e, pretty)
+            elif event == 'start':
+                flush_tail()
+                if stack:
+                    pretty = open_parent()
+                    if len(stack) == record_depth:
+                        record = e
+                        # The record's tail is only flushed once the record has been written.
+                        continue
+                stack.append([e, None, False])
+            else:
+                flush_tail()
+                e, ctx, pretty = stack.pop()
+                if ctx is None:
+                    write_element(e)
+                else:
+                    if pretty:
+                        xf.write(_indent(len(stack)))
+                    ctx.__exit__(None, None, None)
+                tail = (e, bool(stack) and stack[-1][2])
+    out.write(b'\n')
 
 
 def remap_refind(doc, refind_map, tid):
+    """
+    Update refind indices in a document - or a unit element - according to refind_map.
+    """
     for e in doc.xpath(".//refind"):
         try:
             e.text = str(refind_map[tid, e.text])
         except KeyError:  # pragma: no cover
-            tid = '_'.join(doc.xpath(".//file")[0].attrib['f_name'].split('_')[2:])
+            tid = '_'.join(
+                doc.xpath("ancestor-or-self::file|.//file")[0].attrib['f_name'].split('_')[2:])
             e.text = str(refind_map[tid, e.text])
 
 
+def copy_remapped(src, target, refind_map, tid):
+    """
+    Copy a Multi-CAST XML file, updating refind indices on the way.
+    """
+    stream_xml(
+        src,
+        target,
+        4,  # multicast/corpus/text/file/unit
+        transform=lambda unit: remap_refind(unit, refind_map, tid),
+        newline='\r\n')
+
+
 def iter_text(p, markdown=False):
-    for e in p.xpath('child::node()'):
+    for e in CHILD_NODES(p):
         if getattr(e, 'tag', None):
             if e.tag == 'em':
                 yield '*{}*'.format(text(e, markdown=markdown)) if markdown else text(e)
@@ -80,19 +280,25 @@ def iter_text(p, markdown=False):
 
 
 def text(e, markdown=False):
+    if not len(e):  # Shortcut for the common case of an element with text content only.
+        return (e.text or '').strip()
     return ''.join(iter_text(e, markdown=markdown)).strip()
 
 
 def parse_tiers(unit):
-    tiers = collections.defaultdict(list)
-    tiernames = 'gword gloss graid refind isnref'.split()
-    for segment in unit.xpath('annotations/segment'):
-        for name in tiernames:
-            e = segment.xpath(name)
-            if e:
-                tiers[name].append(e[0].text or UNMARKED)
-            else:
-                tiers[name].append(UNMARKED)
+    """
+    Read the tiers of a unit, visiting the children of each segment only once.
+
+    :return: `dict` mapping tier names to lists of values - one per segment.
+    """
+    tiers = {name: [] for name in TIERS}
+    for segment in SEGMENTS(unit):
+        values = {}
+        for e in segment:
+            if e.tag in tiers and e.tag not in values:  # Only the first element counts.
+                values[e.tag] = sys.intern(e.text) if e.text else UNMARKED
+        for name, tier in tiers.items():
+            tier.append(values.get(name, UNMARKED))
     return tiers
 
 
@@ -106,53 +312,123 @@ class Element:
         raise AttributeError(item)  # pragma: no cover
 
 
-class Unit(Element):
+class Unit:
+    """
+    A unit of a Multi-CAST XML file - i.e. an utterance and its annotations - detached from the
+    XML tree.
+
+    All data is decoded eagerly, with tiers stored as tuples of interned strings, so that units are
+    compact and cheap to pickle, e.g. to send them to worker processes. Attributes of the `unit`
+    element are accessible as attributes of the `Unit`.
+    """
+    __slots__ = ('attrib', '_igt', '_words') + FIELDS + TIERS
+
     def __init__(self, e):
-        Element.__init__(self, e)
+        self.attrib = dict(e.attrib)
+        self._igt, self._words = None, None
+        for name in FIELDS:
+            setattr(self, name, None)
+        for child in e:
+            if child.tag in FIELDS and getattr(self, child.tag) is None:
+                setattr(self, child.tag, text(child))
         for name, tier in parse_tiers(e).items():
-            setattr(self, name, tier)
-        glossed_words = list(iter_words(self.gword, self.gloss))
-        self._gword = [w for w, _ in glossed_words]
-        self._gloss = [g for _, g in glossed_words]
+            setattr(self, name, tuple(tier))
 
-    @functools.cached_property
-    def igt(self):
-        igt = IGT(phrase=self._gword, gloss=self._gloss)
-        if igt.conformance.name == 'UNALIGNED':  # pragma: no cover
-            print(igt.conformance.name)
-            for k, v in itertools.zip_longest(self.gword, self.gloss):
-                print(k, v)
-            print(self.gword)
-            print(self.gloss)
-            print('---')
-            print(self._gword)
-            print(self._gloss)
-        return igt
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
 
     def __getattr__(self, item):
-        if item in [
-            'utterance_id',
-            'utterance',
-            'utterance_translation',
-            'add_orthography',
-            'add_comments'
-        ]:
-            for e in self.e.xpath(item):
-                return text(e)
-            return None
-        return Element.__getattr__(self, item)
+        if item != 'attrib' and item in self.attrib:
+            return self.attrib[item]
+        raise AttributeError(item)
+
+    @property
+    def _glossed_words(self):
+        """
+        Pair of tuples `(words, glosses)`, computed from the segments once.
+        """
+        if self._words is None:
+            words = list(iter_words(self.gword, self.gloss))
+            self._words = (tuple(w for w, _ in words), tuple(g for _, g in words))
+        return self._words
+
+    @property
+    def _gword(self):
+        return list(self._glossed_words[0])
+
+    @property
+    def _gloss(self):
+        return list(self._glossed_words[1])
+
+    @property
+    def conformance(self):
+        """
+        The `LGRConformance` level of the unit's glossed words - computed without building an
+        `IGT`, unless the words are unaligned, in which case the `IGT` is built to report
+        details.
+        """
+        res = conformance(*self._glossed_words)
+        if res == LGRConformance.UNALIGNED:  # pragma: no cover
+            return self.igt.conformance
+        return res
+
+    @property
+    def igt(self):
+        if self._igt is None:
+            self._igt = IGT(phrase=self._gword, gloss=self._gloss)
+            if self._igt.conformance.name == 'UNALIGNED':  # pragma: no cover
+                print(self._igt.conformance.name)
+                for k, v in itertools.zip_longest(self.gword, self.gloss):
+                    print(k, v)
+                print(self.gword)
+                print(self.gloss)
+                print('---')
+                print(self._gword)
+                print(self._gloss)
+        return self._igt
 
 
 class File(Element):
+    """
+    The `file` element of a Multi-CAST XML document, read incrementally.
+
+    The attributes of the element are available right away, while units are parsed as they are
+    iterated over. Since `Unit` objects are detached from the XML tree, the elements of units
+    which have been read are removed from the document - so memory use does not grow with the
+    length of a text. Each iteration re-reads the document.
+    """
+    def __init__(self, p):
+        self.path = p
+        for _, e in self._events():
+            if e.tag == 'file':  # Attributes are complete with the start event.
+                assert e.getparent() is not None and e.getparent().tag == 'text', \
+                    'expected file element in text'
+                Element.__init__(self, e)
+                break
+        # Without the `file` element, attribute lookup would recurse in `Element.__getattr__`.
+        assert 'e' in vars(self), 'expected exactly one file'
+
+    def _events(self):
+        return iterparse(str(self.path), events=('start', 'end'), tag=('text', 'file', 'unit'))
+
     def __iter__(self):
-        return (Unit(e) for e in self.e.xpath('unit'))
+        counts = collections.Counter()
+        for event, e in self._events():
+            if e.tag != 'unit':
+                if event == 'start':
+                    counts[e.tag] += 1
+                    assert counts[e.tag] == 1, 'expected exactly one {}'.format(e.tag)
+            elif event == 'end':
+                unit = Unit(e)
+                e.clear()
+                while e.getprevious() is not None:
+                    del e.getparent()[0]
+                yield unit
 
 
 def get_file(p):
-    doc = parse(p).getroot()
-    texts = doc.xpath('.//text')
-    assert len(texts) == 1
-    text = texts[0]
-    files = text.xpath('file')
-    assert len(files) == 1
-    return File(files[0])
+    return File(p)
@@ -1,6 +1,8 @@
 import pathlib
+from argparse import Namespace
 
 import pytest
+from cldfbench import CLDFWriter
 from cldfbench.datadir import DataDir
 
 from multicastpy.dataset import Dataset
@@ -12,9 +14,9 @@ def fixtures():
 
 
 @pytest.fixture
-def api(fixtures):
+def api(fixtures, tmp_path):
     from multicastpy.repos import MultiCast
-    return MultiCast(fixtures)
+    return MultiCast(fixtures, cache_dir=tmp_path / 'cache')
 
 
 @pytest.fixture
@@ -28,8 +30,43 @@ def dataset(tmp_path, fixtures):
         '--corpus', 'veraa',
         '--version', '2311',
         '--target-repos', str(target),
+        '--cache-dir', str(tmp_path / 'cache'),
         str(fixtures)])
     ds = Dataset()
     ds.id = 'mcveraa'
     ds.dir = DataDir(target)
     return ds
+
+
+@pytest.fixture
+def synthetic_dataset(tmp_path):
+    from multicastpy.__main__ import main
+    from multicastpy.synthetic import make_repos
+    target = tmp_path / 'mcsynth'
+    target.mkdir()
+    main([
+        'cldfbench',
+        '--corpus', 'synth',
+        '--version', '2401',
+        '--target-repos', str(target),
+        str(make_repos(tmp_path / 'repos', texts=3, units=5, segments=4, referents=5))])
+    ds = Dataset()
+    ds.id = 'mcsynth'
+    ds.dir = DataDir(target)
+    return ds
+
+
+@pytest.fixture
+def cldf(dataset, mocker):
+    class GLang:
+        id = 'abcd1234'
+        macroareas = [mocker.Mock(name='abcd')]
+        latitude = 1
+        longitude = 2
+
+    with CLDFWriter(cldf_spec=dataset.cldf_specs()) as writer:
+        dataset.cmd_makecldf(Namespace(
+            log=mocker.Mock(),
+            writer=writer,
+            glottolog=mocker.Mock(api=mocker.Mock(languoid=mocker.Mock(return_value=GLang())))))
+    return dataset.cldf_reader()
@@ -0,0 +1,80 @@
+import os
+import wave
+import shutil
+
+import pytest
+
+from multicastpy.audio import *
+from multicastpy.synthetic import write_wav
+
+
+def test_DurationCache(fixtures, tmp_path, mocker):
+    audio = tmp_path / 'mc_veraa_isam.mp3'
+    shutil.copyfile(fixtures / 'data' / 'audio' / 'veraa' / 'mp3' / audio.name, audio)
+    probe = mocker.patch('multicastpy.audio.audio_duration', return_value=5.5)
+    cache = DurationCache(tmp_path / 'cache' / 'durations.json')
+    assert cache.durations([audio]) == {audio.name: 5.5}
+    assert probe.call_count == 1
+    cache.save()
+
+    # Touching the file does not invalidate the cache entry ...
+    os.utime(audio, ns=(0, 0))
+    cache = DurationCache(tmp_path / 'cache' / 'durations.json')
+    assert cache.durations([audio]) == {audio.name: 5.5}
+    assert probe.call_count == 1
+
+    # ... but changing the content does.
+    with audio.open('ab') as f:
+        f.write(b'\x00')
+    assert cache.durations([audio]) == {audio.name: 5.5}
+    assert probe.call_count == 2
+
+
+def test_mp3_duration(fixtures, tmp_path):
+    mp3 = fixtures / 'data' / 'audio' / 'veraa' / 'mp3' / 'mc_veraa_isam.mp3'
+    # The duration as reported by ffprobe, computed from the Info header:
+    assert mp3_duration(mp3) == pytest.approx(442.0)
+
+    # Without Info header, frames are counted:
+    data = mp3.read_bytes()
+    pos = data.index(b'Info') - 21
+    tp = tmp_path / 'test.mp3'
+    tp.write_bytes(data[:pos] + data[pos + 182:])
+    assert mp3_duration(tp) == pytest.approx(442.044, abs=0.001)
+
+    tp.write_bytes(b'\x00' * 100)
+    with pytest.raises(ValueError):
+        mp3_duration(tp)
+
+
+def test_WavFile(tmp_path):
+    write_wav(tmp_path / 'test.wav', 2000, framerate=8000)
+    with wave.open(str(tmp_path / 'test.wav'), 'rb') as f:
+        data = f.readframes(f.getnframes())
+    with WavFile(tmp_path / 'test.wav') as wav:
+        assert wav.duration == pytest.approx(2.0) and wav.nchannels == 1
+        frames = wav.frames(500, 1000)
+        assert isinstance(frames, memoryview) and len(frames) == 4000
+        assert bytes(frames) == data[4000:8000]
+        assert len(wav.frames()) == len(data) and len(wav.frames(1500, 500)) == 0
+    # Slices are still valid after closing the file:
+    assert bytes(frames) == data[4000:8000]
+
+    tmp_path.joinpath('test.mp3').write_bytes(b'\x00' * 100)
+    with pytest.raises(ValueError):
+        WavFile(tmp_path / 'test.mp3')
+    tmp_path.joinpath('test.mp3').write_bytes(b'RIFF\x04\x00\x00\x00WAVE')
+    with pytest.raises(ValueError):
+        WavFile(tmp_path / 'test.mp3')
+
+
+def test_WavCache(tmp_path):
+    for i in range(3):
+        write_wav(tmp_path / '{}.wav'.format(i), 1000)
+    with WavCache(maxsize=2) as cache:
+        assert len(cache.frames(tmp_path / '0.wav', 0, 500)) == 500
+        wav = cache[tmp_path / '1.wav']
+        assert cache[tmp_path / '0.wav'] is cache[tmp_path / '0.wav']
+        cache.frames(tmp_path / '2.wav')
+        assert len(cache) == 2 and wav._mmap.closed
+    assert len(cache) == 0
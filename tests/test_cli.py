@@ -27,4 +27,16 @@ def test_all(tmp_path, fixtures):
         '--corpus', 'veraa',
         '--version', '2311',
         '--target-repos', str(target),
+        '--cache-dir', str(tmp_path / 'cache'),
         str(fixtures)])
+    assert '.cache/' in target.joinpath('.gitignore').read_text(encoding='utf8').split()
+
+    target.joinpath('.gitignore').write_text('*.pyc', encoding='utf8')
+    main([
+        'cldfbench',
+        '--corpus', 'veraa',
+        '--version', '2311',
+        '--target-repos', str(target),
+        '--cache-dir', str(tmp_path / 'cache'),
+        str(fixtures)])
+    assert target.joinpath('.gitignore').read_text(encoding='utf8') == '*.pyc\n.cache/\n'
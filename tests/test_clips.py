@@ -0,0 +1,82 @@
+import sys
+import logging
+
+import pytest
+from pycldf import TextCorpus
+
+from multicastpy.__main__ import main
+from multicastpy.clips import *
+from multicastpy.synthetic import write_wav
+
+# A stand-in for ffmpeg, writing the time range of each output to the output file.
+FFMPEG = """import sys
+args = sys.argv[1:]
+for i, arg in enumerate(args):
+    if arg == '-to':
+        with open(args[i + 2], 'w') as f:
+            f.write('{}-{}'.format(args[i - 1], args[i + 1]))
+"""
+
+
+@pytest.fixture
+def ffmpeg(tmp_path):
+    p = tmp_path / 'ffmpeg'
+    p.write_text('#!{}\n{}'.format(sys.executable, FFMPEG), encoding='utf8')
+    p.chmod(0o755)
+    return str(p)
+
+
+def test_iter_recordings(cldf):
+    recordings = dict(iter_recordings(cldf))
+    assert len(recordings) == 1
+    recording, clips = recordings.popitem()
+    assert recording.name == 'mc_veraa_isam.mp3' and recording.exists()
+    assert clips[0] == Clip('isam_0001', 0, 14079)
+
+
+def test_extract_clips(cldf, ffmpeg, tmp_path):
+    n = len(dict(iter_recordings(cldf))[cldf.directory / 'media' / 'mc_veraa_isam.mp3'])
+    assert extract_clips(cldf, tmp_path / 'clips', ffmpeg=ffmpeg) == (n, 0)
+    assert tmp_path.joinpath('clips', 'isam_0001.mp3').read_text() == '0.000-14.079'
+
+    assert extract_clips(cldf, tmp_path / 'clips', ffmpeg=ffmpeg) == (0, n)
+    tmp_path.joinpath('clips', 'isam_0001.mp3').write_text('changed')
+    assert extract_clips(cldf, tmp_path / 'clips', ffmpeg=ffmpeg) == (1, n - 1)
+    tmp_path.joinpath('clips', 'isam_0001.mp3').unlink()
+    assert extract_clips(cldf, tmp_path / 'clips', ffmpeg=ffmpeg) == (1, n - 1)
+    assert tmp_path.joinpath('clips', 'isam_0001.mp3').read_text() == '0.000-14.079'
+
+
+def test_cli(cldf, ffmpeg, tmp_path, caplog):
+    with caplog.at_level(logging.INFO):
+        main(['clips', str(cldf.tablegroup._fname), str(tmp_path / 'clips'), '--ffmpeg', ffmpeg],
+             log=logging.getLogger(__name__))
+        main(['clips', str(cldf.tablegroup._fname), str(tmp_path / 'clips'), '--ffmpeg', ffmpeg],
+             log=logging.getLogger(__name__))
+    assert '0 clips extracted' in caplog.records[-1].message
+
+
+def test_WavClips(tmp_path):
+    cldf = TextCorpus.in_dir(tmp_path / 'cldf')
+    cldf.add_component('MediaTable')
+    cldf.add_columns(
+        'ExampleTable',
+        {'name': 'Media_IDs', 'separator': ' ',
+         'propertyUrl': 'http://cldf.clld.org/v1.0/terms.rdf#mediaReference'},
+        {'name': 'Audio_Start', 'datatype': 'integer'},
+        {'name': 'Audio_End', 'datatype': 'integer'})
+    tmp_path.joinpath('cldf', 'media').mkdir()
+    write_wav(tmp_path / 'cldf' / 'media' / 'rec.wav', 2000)
+    cldf.write(
+        MediaTable=[
+            dict(ID='wav', Name='rec.wav', Media_Type='audio/x-wav', Download_URL='media/rec.wav'),
+            dict(ID='mp3', Name='rec.mp3', Media_Type='audio/mpeg', Download_URL='media/rec.mp3'),
+        ],
+        ExampleTable=[
+            dict(ID='u{}'.format(i), Language_ID='l', Primary_Text='x', Analyzed_Word=[],
+                 Gloss=[], Media_IDs=['mp3', 'wav'], Audio_Start=i * 500, Audio_End=i * 500 + 400)
+            for i in range(3)],
+    )
+    with WavClips(cldf, maxsize=1) as clips:
+        assert 'u1' in clips and len(clips['u1']) == 400
+        assert len(clips.frames(tmp_path / 'cldf' / 'media' / 'rec.wav', 1900)) == 100
@@ -1,26 +1,118 @@
+import time
+import concurrent.futures
 from argparse import Namespace
 
 from cldfbench import CLDFWriter
+from clldutils.jsonlib import load
 
+from multicastpy.dataset import option
+from multicastpy.refind import TsvIndex, refind_map
 
-def test_dataset(dataset, mocker):
-    assert dataset.lid == 'veraa'
-    assert dataset.with_refind
 
+def test_option(monkeypatch):
+    assert option(Namespace(workers=3), 'workers', default=1) == 3
+    assert option(Namespace(), 'workers', default=1) == 1
+    monkeypatch.setenv('MULTICAST_WORKERS', '4')
+    assert option(Namespace(), 'workers', default=1) == 4
+
+
+def _makecldf(dataset, mocker, **kw):
     class GLang:
         id = 'abcd1234'
         macroareas = [mocker.Mock(name='abcd')]
         latitude = 1
         longitude = 2
 
+    log = mocker.Mock()
     with CLDFWriter(cldf_spec=dataset.cldf_specs()) as writer:
         dataset.cmd_makecldf(Namespace(
-            log=mocker.Mock(),
+            log=log,
             writer=writer,
             glottolog=mocker.Mock(api=mocker.Mock(languoid=mocker.Mock(return_value=GLang()))),
-        ))
+            **kw))
+    return log
+
+
+def test_dataset(dataset, mocker):
+    assert dataset.lid == 'veraa'
+    assert dataset.with_refind
+
+    _makecldf(dataset, mocker)
 
     # FIXME: must run makecldf first!
     md = dataset.cmd_readme(None)
     assert 'image.jpg' in md
-    assert dataset.cldf_reader().validate()
\ No newline at end of file
+    assert dataset.cldf_reader().validate()
+
+
+def test_dataset_incremental(dataset, mocker):
+    _makecldf(dataset, mocker, incremental=1)
+    assert dataset.cache_dir.joinpath('manifest.json').exists()
+    utterances = dataset.cldf_dir.joinpath('utterances.csv').read_text(encoding='utf8')
+    dataset.cldf_dir.joinpath('media', 'stale.txt').write_text('x', encoding='utf8')
+
+    log = _makecldf(dataset, mocker, incremental=1)
+    assert log.info.call_args[0][0].startswith('0 of 1')
+    assert any(c[0][0].startswith('stage manifest') for c in log.info.call_args_list)
+    assert dataset.cldf_dir.joinpath('utterances.csv').read_text(encoding='utf8') == utterances
+    assert not dataset.cldf_dir.joinpath('media', 'stale.txt').exists()
+
+    # Altering an output file - even without changing its size - forces the text to be converted
+    # again:
+    xml = dataset.cldf_dir.joinpath('media', 'mc_veraa_isam.xml')
+    content = xml.read_bytes()
+    xml.write_bytes(content.replace(b'<', b'>', 1))
+    log = _makecldf(dataset, mocker, incremental=1)
+    assert log.info.call_args[0][0].startswith('1 of 1')
+    assert xml.read_bytes() == content
+
+    # Removing an output file forces the text to be converted again:
+    dataset.cldf_dir.joinpath('media', 'mc_veraa_isam.xml').unlink()
+    log = _makecldf(dataset, mocker, incremental=1)
+    assert log.info.call_args[0][0].startswith('1 of 1')
+    assert dataset.cldf_reader().validate()
+
+
+def test_dataset_workers(synthetic_dataset, mocker):
+    def read_cldf():
+        # The languages depend on the mocked Glottolog data only.
+        return {
+            p.relative_to(synthetic_dataset.cldf_dir): p.read_bytes()
+            for p in sorted(synthetic_dataset.cldf_dir.glob('**/*'))
+            if p.is_file() and p.name != 'languages.csv'}
+
+    _makecldf(synthetic_dataset, mocker)
+    serial = read_cldf()
+    assert len(synthetic_dataset.raw_dir.read_json('texts.json')) == 3
+    pool = mocker.spy(concurrent.futures, 'ProcessPoolExecutor')
+    _makecldf(synthetic_dataset, mocker, workers=2)
+    assert pool.call_count == 1
+    assert read_cldf() == serial
+
+
+def test_dataset_stream_examples(dataset, mocker):
+    _makecldf(dataset, mocker)
+    utterances = dataset.cldf_dir.joinpath('utterances.csv').read_text(encoding='utf8')
+    _makecldf(dataset, mocker, stream_examples=1)
+    assert dataset.cldf_dir.joinpath('utterances.csv').read_text(encoding='utf8') == utterances
+    assert dataset.cldf_reader().validate()
+
+
+def test_dataset_profile(dataset, mocker, tmp_path):
+    def slow(func):
+        def wrapped(*args, **kw):
+            time.sleep(0.2)
+            return func(*args, **kw)
+        return wrapped
+
+    # Make sure the work is attributed to the stages which claim it:
+    mocker.patch('multicastpy.dataset.TsvIndex', slow(TsvIndex))
+    mocker.patch('multicastpy.dataset.refind_map', slow(refind_map))
+    log = _makecldf(dataset, mocker, profile=str(tmp_path / 'profile.json'), tracemalloc=1)
+    assert any(c[0][0].startswith('text isam: total') for c in log.info.call_args_list)
+    profile = load(tmp_path / 'profile.json')
+    assert 'peak' in profile['stages']['remap']
+    assert profile['stages']['tsv_index']['seconds'] >= 0.2
+    assert profile['stages']['refind_map']['seconds'] >= 0.2
+    assert profile['stages']['schema']['seconds'] < 0.2
+    assert {'xml', 'units', 'igt', 'audio'}.issubset(profile['texts']['isam'])
@@ -1,3 +1,5 @@
+import collections
+
 from multicastpy.eaf import *
 
 
@@ -5,3 +7,24 @@ def test_add_orthography(api):
     res = add_orthography(api.data / '2311' / 'mandarin' / 'eaf' / 'mc_mandarin_hml.eaf')
     assert res['0001']
     assert not add_orthography(api.data / '2311' / 'veraa' / 'eaf' / 'mc_veraa_isam.eaf')
+
+
+def test_EafDocument(api, tmp_path):
+    eaf = EafDocument(api.data / '2311' / 'mandarin' / 'eaf' / 'mc_mandarin_hml.eaf')
+    assert eaf.tiers['utterance'].get('PARENT_REF') == 'utterance_id'
+    uid = next(eaf.iter_annotations('utterance_id'))
+    assert eaf.value(uid).endswith('_0001')
+    utterance = [
+        a for a in eaf.refs[uid.get('ANNOTATION_ID')] if a.getparent().getparent() is
+        eaf.tiers['utterance']][0]
+    assert eaf.annotations[utterance.get('ANNOTATION_REF')] is uid
+    assert eaf.add_orthography() == add_orthography(
+        api.data / '2311' / 'mandarin' / 'eaf' / 'mc_mandarin_hml.eaf')
+
+    eaf = EafDocument(api.data / '2311' / 'veraa' / 'eaf' / 'mc_veraa_isam.eaf')
+    refind = [eaf.value(a) for a in eaf.iter_annotations('refind')]
+    eaf.remap_refind(collections.defaultdict(lambda: 'x'), 'isam')
+    eaf.write(tmp_path / 'test.eaf')
+    eaf = EafDocument(tmp_path / 'test.eaf')
+    assert {eaf.value(a) for a in eaf.iter_annotations('refind')} == {'x'} and refind
+    assert not list(eaf.iter_annotations('xyz'))
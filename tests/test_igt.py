@@ -0,0 +1,31 @@
+import pytest
+from pyigt import IGT
+
+from multicastpy.igt import *
+from multicastpy.xml import get_file
+
+
+@pytest.mark.parametrize(
+    'words,glosses',
+    [
+        (['a', 'b'], ['A']),
+        (['a-b', 'c'], ['A-B', 'C']),
+        (['a-b', 'c'], ['A.B', 'C']),
+        (['a=b'], ['A-B']),
+        (['-a'], ['-A']),
+        (['a-'], ['A']),
+        (['a--b'], ['A--B']),
+        (['a-b'], ['A-']),
+        (['a'], ['-']),
+        ([''], ['']),
+        (['a~b<c>'], ['A~B<C>']),
+    ]
+)
+def test_conformance(words, glosses):
+    assert conformance(words, glosses) == IGT(phrase=words, gloss=glosses).conformance
+
+
+def test_file_conformance(fixtures):
+    file = get_file(fixtures / 'data' / '2311' / 'veraa' / 'xml' / 'mc_veraa_isam.xml')
+    res = file_conformance(file)
+    assert res == {unit.uid: unit.igt.conformance for unit in file}
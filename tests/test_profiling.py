@@ -0,0 +1,33 @@
+import tracemalloc
+
+from clldutils.jsonlib import load
+
+from multicastpy.profiling import Profile
+
+
+def test_Profile(tmp_path, mocker):
+    with Profile(memory=True) as profile:
+        assert tracemalloc.is_tracing()
+        with profile('outer'):
+            with profile('inner', text='t1'):
+                x = [0] * 100000
+            del x
+            with profile('inner', text='t1'):
+                pass
+    assert not tracemalloc.is_tracing()
+    assert profile.texts['t1']['inner']['calls'] == 2
+    assert profile.stages['outer']['peak'] >= profile.texts['t1']['inner']['peak'] > 800000
+
+    profile.update({'t2': {'total': dict(seconds=1, calls=1)}})
+    log = mocker.Mock()
+    profile.report(log)
+    assert log.info.call_args[0][0] == 'text t2: total 1.000s'
+    profile.dump(tmp_path / 'profile.json')
+    assert load(tmp_path / 'profile.json')['stages']['outer']['calls'] == 1
+
+    profile = Profile()
+    with profile('stage'):
+        pass
+    assert 'peak' not in profile.stages['stage']
+    assert list(profile.iter('items', range(3))) == [0, 1, 2]
+    assert profile.stages['items']['calls'] == 4
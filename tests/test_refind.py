@@ -1,9 +1,14 @@
 import shutil
+import collections
 import logging
 
 import pytest
 
+from csvw.dsv import reader
+
 from multicastpy.refind import *
+from multicastpy.refind import scan_tsv
+from multicastpy.util import FileCache
 
 
 @pytest.fixture
@@ -11,6 +16,68 @@ def rmap(api):
     return refind_map(api.path('data', '2311', 'veraa', 'tsv'))
 
 
+def test_TsvIndex(api, rmap):
+    index = TsvIndex(api.path('data', '2311', 'veraa', 'tsv'))
+    assert index.with_isnref
+    assert index.files['mc_veraa_isam.tsv'].tid == 'isam'
+    assert 'refind' in index.files['mc_veraa_isam.tsv'].columns
+    assert refind_map(index) == rmap
+
+
+def test_TsvIndex_cache(api, rmap, tmp_path, mocker):
+    cache = FileCache(tmp_path / 'cache.json')
+    index = TsvIndex(api.path('data', '2311', 'veraa', 'tsv'), cache=cache)
+    assert tmp_path.joinpath('cache.json').exists()
+    scan = mocker.patch('multicastpy.refind.scan_tsv')
+    cached = TsvIndex(api.path('data', '2311', 'veraa', 'tsv'), cache=FileCache(cache.path))
+    assert not scan.called
+    assert cached.files == index.files and refind_map(cached) == rmap
+
+
+def test_RefindMap():
+    rmap = RefindMap(collections.OrderedDict([('a', {'0002', '0010'}), ('b', set())]))
+    assert rmap.has_refinds and rmap.width == 2
+    assert rmap['a'] == 1 and rmap['b'] == 2
+    assert rmap.remap('a', '0010') == rmap['a', '0010'] == 110
+    assert rmap.remap_many('a', ['0010', '0002']) == [110, 102]
+    assert ('a', '0002') in rmap and ('a', '2') not in rmap and ('b', '0002') not in rmap
+    assert 'c' not in rmap and None not in rmap
+    for key in [('a', '0003'), ('a', '3'), ('c', '0002')]:
+        with pytest.raises(KeyError):
+            rmap.remap(*key)
+        with pytest.raises(KeyError):
+            rmap.remap_many(key[0], ['0010', key[1]])
+    assert list(rmap) == ['a', ('a', '0002'), ('a', '0010'), 'b'] and len(rmap) == 4
+    assert rmap == {'a': 1, ('a', '0002'): 102, ('a', '0010'): 110, 'b': 2}
+    assert not RefindMap(dict(a=set())).has_refinds
+
+
+@pytest.mark.parametrize(
+    'content',
+    [
+        'a\trefind\tisnref\r\nx\t0001\t\r\n\ufeffy\t\tnew\r\n',
+        '\ufeffrefind\ta\n0001\tx\n0002\t\n',
+        'a\trefind\n"x\ty"\t0001\nz\t"00""02"\n',
+        'a\trefind\rx\t0001\r',
+        'a\tb\nx\ty\n',
+        'a\trefind\tisnref\nx\t0001\nx\n\ny\t0002\tnew\n\n',
+        'a\trefind\tisnref\n"x"\n\ny\t0002\tnew\r\n\r\n',
+    ]
+)
+def test_scan_tsv(tmp_path, content):
+    p = tmp_path / 'test.tsv'
+    p.write_bytes(content.encode('utf8'))
+    rows = list(reader(p, delimiter='\t'))
+    header, values = scan_tsv(p)
+    assert header == rows[0]
+    rows = list(reader(p, delimiter='\t', dicts=True))
+    for col in ['refind', 'isnref']:
+        if col in header:
+            assert values[col] == [row[col] or '' for row in rows]
+        else:
+            assert col not in values
+
+
 def test_iter_referents(api, rmap, caplog):
     assert len(rmap) == 59
     assert max(list(rmap.values())) == 158
@@ -27,7 +94,120 @@ def test_iter_referents(api, rmap, caplog):
 
 def test_remap_refind(api, rmap, tmp_path):
     d = api.path('data', '2311', 'veraa')
+    tmp_path.joinpath('streamed').mkdir()
     for dd in d.iterdir():
         for p in dd.iterdir():
             shutil.copyfile(p, tmp_path / p.name)
             remap_refind(tmp_path / p.name, rmap)
+            # Streaming the remapped file to a different location gives the same result:
+            remap_refind(p, rmap, target=tmp_path / 'streamed' / p.name)
+            assert tmp_path.joinpath('streamed', p.name).read_bytes() == \
+                tmp_path.joinpath(p.name).read_bytes()
+
+
+def test_remap_refind_tsv(tmp_path):
+    rmap = RefindMap(dict(t={'0001'}))
+    p = tmp_path / 'mc_x_t_a.tsv'
+    p.write_text('a\trefind\r\nx\t0001\r\ny\t\r\n', encoding='utf8')
+    remap_refind(p, rmap, target=tmp_path / 'target.tsv')
+    assert tmp_path.joinpath('target.tsv').read_text(encoding='utf8') == 'a\trefind\nx\t11\ny\t\n'
+
+    content = 'a\trefind\nx\t\n'
+    p.write_text(content, encoding='utf8')
+    remap_refind(p, rmap, target=tmp_path / 'target.tsv')
+    assert tmp_path.joinpath('target.tsv').read_text(encoding='utf8') == content
+    mtime = p.stat().st_mtime_ns
+    remap_refind(p, rmap)
+    assert p.read_text(encoding='utf8') == content and p.stat().st_mtime_ns == mtime
+
+    index = TsvIndex(tmp_path)
+    p.write_text('a\trefind\nx\t0001\n', encoding='utf8')
+    remap_refind(p, rmap, tsv_index=index)  # The index says, there are no refinds.
+    remap_refind(p, rmap, tsv_index=index, target=tmp_path / 'target.tsv')
+    assert '0001' in tmp_path.joinpath('target.tsv').read_text(encoding='utf8')
+    assert sorted(pp.name for pp in tmp_path.iterdir()) == ['mc_x_t_a.tsv', 'target.tsv']
+
+
+def test_remap_refind_tsv_short_rows(tmp_path):
+    p = tmp_path / 'mc_x_t.tsv'
+    p.write_text('a\tb\trefind\tisnref\nx\tt\t0001\t\nx\tt\n\ny\tz\t\t\n', encoding='utf8')
+    remap_refind(p, RefindMap(dict(t={'0001'})))
+    assert p.read_text(encoding='utf8') == \
+        'a\tb\trefind\tisnref\nx\tt\t11\t\nx\tt\t\t\ny\tz\t\t\n'
+
+
+@pytest.mark.parametrize(
+    'content,expected',
+    [
+        ('a\trefind\nx\nx\t0001\n\n', 'a\trefind\nx\t\nx\t11\n'),
+        ('a\trefind\nx\n\ny\t\n', 'a\trefind\nx\n\ny\t\n'),  # Nothing to rewrite.
+        ('', ''),
+    ]
+)
+def test_remap_refind_tsv_target(tmp_path, content, expected):
+    d = tmp_path / 'tsv'
+    d.mkdir()
+    p = d / 'mc_x_t.tsv'
+    p.write_text(content, encoding='utf8')
+    index = TsvIndex(d) if content else None
+    remap_refind(p, RefindMap(dict(t={'0001'})), tsv_index=index, target=tmp_path / 'target.tsv')
+    assert tmp_path.joinpath('target.tsv').read_text(encoding='utf8') == expected
+    assert p.read_text(encoding='utf8') == content
+    assert [pp.name for pp in d.iterdir()] == ['mc_x_t.tsv']
+
+
+@pytest.mark.parametrize('workers,processes', [(1, False), (3, False), (2, True)])
+def test_remap_files(api, rmap, tmp_path, workers, processes):
+    d = api.path('data', '2311', 'veraa')
+    items = [(p, tmp_path / p.name) for dd in sorted(d.iterdir()) for p in sorted(dd.iterdir())]
+    res = remap_files(items, rmap, workers=workers, processes=processes)
+    assert [r is not None for r in res] == [p.suffix == '.eaf' for p, _ in items]
+    for p, target in items:
+        remap_refind(p, rmap, target=tmp_path / 'expected')
+        assert target.read_bytes() == tmp_path.joinpath('expected').read_bytes()
+
+    log = logging.getLogger(__name__)
+    items = [(p, tmp_path / p.name) for p in [d / 'xml' / 'mc_veraa_isam.xml']] + [
+        (tmp_path / 'mc_veraa_x{}.tsv'.format(i), tmp_path / 'target.tsv') for i in range(2)]
+    with pytest.raises(ValueError) as e:
+        remap_files(items, rmap, workers=workers, processes=processes, log=log)
+    assert '2 files' in str(e.value) and 'mc_veraa_x0.tsv' in str(e.value)
+
+
+def test_ReferentGraph(api, rmap):
+    graph = ReferentGraph(iter_referents(
+        api.path(
+            'data', 'docs', 'corpora', 'list-of-referents', 'veraa', 'tsv',
+            'mc_veraa_list-of-referents.tsv'),
+        rmap))
+    reef, pieces, bigger, other = [rmap['isam', r] for r in ['0003', '0037', '0038', '0039']]
+    assert {pieces, bigger, other} < graph.members(reef)
+    assert graph.sets(pieces) == {reef} and reef in graph.sets(bigger, transitive=True)
+    assert graph.members(pieces) == {bigger, other}
+    assert graph.parts(reef) == {rmap['isam', '0017'], pieces, bigger, other}
+    assert graph.wholes(bigger) == {pieces, reef} == graph.wholes(bigger, transitive=True)
+    assert graph.parts(pieces, transitive=True) == {bigger, other}
+    assert graph.members(rmap['isam', '0018'], transitive=True) >= graph.members(reef)
+    assert not graph.members(1234)
+    with pytest.raises(ValueError):  # No mentions added yet.
+        graph.clauses(reef)
+
+    graph.add_mentions('u1', [reef])
+    graph.add_mentions('u2', [bigger, bigger])
+    graph.add_mentions('u3', [reef, other])
+    assert graph.clauses(reef) == ['u1', 'u3', 'u2']
+    assert graph.clauses(reef, subsets=False) == ['u1', 'u3']
+
+
+def test_ReferentGraph_from_cldf(cldf, dataset):
+    graph = ReferentGraph.from_cldf(cldf)
+    assert len(graph.referents) == len(list(cldf['referents.csv'])) - 1
+    assert len(graph.relations) == len(list(cldf['referent_relations.csv']))
+    reef = int([r for r in cldf['referents.csv'] if r['description'] == 'reef'][0]['refind'])
+    direct = graph.clauses(reef, subsets=False)
+    assert direct == [r['ID'] for r in cldf['ExampleTable'] if str(reef) in r['refind']]
+    assert set(direct) < set(graph.clauses(reef))
+
+    # Mentions are added to the graph of the dataset while the CLDF data is built:
+    assert dataset.referent_graph().clauses(reef) == graph.clauses(reef)
+    assert dataset.referent_graph().clauses(reef, subsets=False) == direct
@@ -1,5 +1,37 @@
+from clldutils.jsonlib import load
 
 
 def test_metadata(api):
     res = api.metadata('2311', 'veraa')
     assert res.id == 'veraa'
+
+
+def test_metadata_cache(fixtures, tmp_path, mocker):
+    import shutil
+    from multicastpy.repos import MultiCast
+
+    repos = tmp_path / 'repos'
+    shutil.copytree(fixtures / 'data' / 'docs', repos / 'data' / 'docs')
+    shutil.copy(fixtures / 'index.html', repos / 'index.html')
+    (repos / 'data' / '2311').mkdir()
+    md = MultiCast(repos).metadata('2311', 'veraa')
+    assert repos.joinpath('.cache', 'metadata.json').exists()
+
+    compute = mocker.spy(MultiCast, '_metadata')
+    assert MultiCast(repos).metadata('2311', 'veraa') == md
+    assert compute.call_count == 0
+
+    # Only touching an input does not invalidate the cache ...
+    repos.joinpath('index.html').touch()
+    assert MultiCast(repos).metadata('2311', 'veraa') == md
+    assert compute.call_count == 0
+
+    # ... but changing it does.
+    citation = MultiCast(repos).citation_path('veraa')
+    citation.write_text(citation.read_text(encoding='utf8') + ' ', encoding='utf8')
+    assert MultiCast(repos).metadata('2311', 'veraa') == md
+    assert compute.call_count == 1
+    assert len(load(repos / '.cache' / 'metadata.json')) == 1
+
+    assert MultiCast(repos, cache_dir=False).metadata('2311', 'veraa') == md
+    assert compute.call_count == 2
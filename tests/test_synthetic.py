@@ -0,0 +1,42 @@
+from argparse import Namespace
+
+from cldfbench import CLDFWriter
+
+from multicastpy.synthetic import make_repos
+from multicastpy.repos import MultiCast
+from multicastpy.xml import get_file
+from multicastpy.eaf import add_orthography
+from multicastpy.refind import refind_map, iter_referents
+
+
+def test_make_repos(tmp_path):
+    mc = MultiCast(make_repos(tmp_path, texts=2, units=3, segments=4, referents=5))
+    assert mc.corpora == ['synth']
+    md = mc.metadata('2401', 'synth')
+    assert [t.id for t in md.texts] == ['text1', 'text2']
+
+    data = mc.data / '2401' / 'synth'
+    units = list(get_file(data / 'xml' / 'mc_synth_text1.xml'))
+    assert len(units) == 3 and len(units[0].gword) == 4
+    assert add_orthography(data / 'eaf' / 'mc_synth_text1.eaf')['0001'] == \
+        units[0].add_orthography
+
+    rmap = refind_map(data / 'tsv')
+    assert all(('text1', r) in rmap for u in units for r in u.refind if r != '∅')
+    referents = list(iter_referents(
+        mc.docs.joinpath(
+            'corpora', 'list-of-referents', 'synth', 'tsv', 'mc_synth_list-of-referents.tsv'),
+        rmap))
+    assert len(referents) == len(rmap) - 2
+    assert (mc.data / 'audio' / 'synth' / 'wav' / 'mc_synth_text1.wav').exists()
+
+
+def test_synthetic_dataset(synthetic_dataset, mocker):
+    glang = Namespace(
+        id='vera1241', macroareas=[Namespace(name='Papunesia')], latitude=1, longitude=2)
+    with CLDFWriter(cldf_spec=synthetic_dataset.cldf_specs()) as writer:
+        synthetic_dataset.cmd_makecldf(Namespace(
+            log=mocker.Mock(),
+            writer=writer,
+            glottolog=mocker.Mock(api=mocker.Mock(languoid=mocker.Mock(return_value=glang)))))
+    assert synthetic_dataset.cldf_reader().validate()
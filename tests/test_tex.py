@@ -11,3 +11,16 @@ def test_iter_text_metadata(api):
         api.corpora_tex, api.text_metadata('2311'), 'tulil', gmd))
     assert res[0]['id'] == 'all1'
     assert res[0]['local_id'] == 'AL_L1'
+
+
+def test_index_corpora(api):
+    sections = index_corpora(api.corpora_tex)
+    assert 'tulil' in sections and 'arta' in sections
+    assert sections['tulil'].texts()['all1'] == ('AL_L1', None)
+    md = sections['tulil'].metadata()
+    assert md['sources'] == ['meng2018'] and md['affiliation'] == 'Papuan, Taulil-Butam'
+    assert sections['arta'].descriptions
+
+    gmd = {}
+    assert list(iter_text_metadata(sections, api.text_metadata('2311'), 'arta', gmd)) == \
+        list(iter_text_metadata(api.corpora_tex, api.text_metadata('2311'), 'arta', {}))
@@ -1,6 +1,8 @@
 import shutil
 import pathlib
 
+import pytest
+
 import multicastpy
 from multicastpy.util import *
 
@@ -16,3 +18,48 @@ def test_rmdir(tmp_path):
 def test_is_same():
     assert is_same(__file__, __file__)
     assert not is_same(__file__, multicastpy.__file__)
+
+
+def test_text_id():
+    assert text_id(pathlib.Path('mc_veraa_isam_a.xml')) == 'isam'
+    assert text_id(pathlib.Path('mc_veraa_isam.xml')) == 'isam'
+
+
+def test_FileIndex(tmp_path):
+    for name in ['xml/mc_abc_t1_a.xml', 'xml/mc_abc_t1_b.xml', 'xml/mc_abc_t10.xml',
+                 'audio/mc_abc_t1.wav', 'image.jpg']:
+        tmp_path.joinpath(name).parent.mkdir(exist_ok=True)
+        tmp_path.joinpath(name).write_text('abc', encoding='utf8')
+    index = FileIndex(tmp_path)
+    assert [p.name for p in index.parts('t1', '.xml', subdir='xml')] == \
+        ['mc_abc_t1_a.xml', 'mc_abc_t1_b.xml']
+    assert tmp_path / 'image.jpg' in index
+    assert index.size(tmp_path / 'audio' / 'mc_abc_t1.wav') == 3
+    assert len(index.files('xml', ['.xml'])) == 3
+
+    index.unlink(tmp_path / 'xml' / 'mc_abc_t10.xml')
+    assert not index.texts['t10'] and not tmp_path.joinpath('xml', 'mc_abc_t10.xml').exists()
+    tmp_path.joinpath('new.txt').write_text('abcd', encoding='utf8')
+    index.add(tmp_path / 'new.txt')
+    assert index.stat(tmp_path / 'new.txt').st_size == 4
+
+
+def test_replacing(tmp_path):
+    p = tmp_path / 'test.txt'
+    p.write_text('a', encoding='utf8')
+    p.chmod(0o640)
+    with replacing(p) as tmp:
+        tmp.write_text('b', encoding='utf8')
+    assert p.read_text(encoding='utf8') == 'b' and (p.stat().st_mode & 0o777) == 0o640
+
+    with pytest.raises(ValueError):
+        with replacing(p) as tmp:
+            tmp.write_text('c', encoding='utf8')
+            raise ValueError()
+    with replacing(p) as tmp:
+        tmp.write_text('c', encoding='utf8')
+        tmp.unlink()
+    with replacing(tmp_path / 'new.txt') as tmp:
+        tmp.write_text('c', encoding='utf8')
+    assert p.read_text(encoding='utf8') == 'b'
+    assert sorted(pp.name for pp in tmp_path.iterdir()) == ['new.txt', 'test.txt']
@@ -1,10 +1,13 @@
+import os
+import pickle
 import shutil
 
 import pytest
 from lxml.etree import fromstring
 
+from multicastpy import xml as mcxml
 from multicastpy.xml import *
-from multicastpy.xml import iter_words
+from multicastpy.xml import iter_words, parse_tiers
 
 
 @pytest.mark.parametrize(
@@ -47,6 +50,24 @@ def test_get_file(fixtures):
         assert unit.add_orthography is None
         break
 
+    units = list(file)
+    assert units[0].utterance == next(iter(file)).utterance
+    assert units[0].start_time == '0'
+    with pytest.raises(AttributeError):
+        _ = units[0].unknown
+
+    unit = pickle.loads(pickle.dumps(units[1]))
+    assert unit.gword == units[1].gword and unit.uid == units[1].uid
+    assert unit.igt.conformance == units[1].igt.conformance
+
+
+def test_Unit_glossed_words(fixtures, mocker):
+    unit = next(iter(get_file(fixtures / 'data' / '2311' / 'veraa' / 'xml' / 'mc_veraa_isam.xml')))
+    words = mocker.spy(mcxml, 'iter_words')
+    assert unit.conformance == unit.igt.conformance
+    assert unit.igt.phrase == unit._gword and len(unit._gloss) == len(unit._gword)
+    assert words.call_count == 1
+
 
 def test_updateable_xml(fixtures, tmp_path):
     tp = tmp_path / 'test.xml'
@@ -56,3 +77,86 @@ def test_updateable_xml(fixtures, tmp_path):
             e.text = 'teststuff'
             break
     assert 'teststuff' in tp.read_text(encoding='utf8')
+
+    content, mtime = tp.read_bytes(), tp.stat().st_mtime_ns
+    os.utime(tp, ns=(mtime - 10 ** 9, mtime - 10 ** 9))
+    with updateable_xml(tp) as xml:
+        pass
+    assert tp.read_bytes() == content and tp.stat().st_mtime_ns == mtime - 10 ** 9
+    assert [p.name for p in tmp_path.iterdir()] == ['test.xml']
+
+
+@pytest.mark.parametrize(
+    'xml',
+    [
+        '<corpus><text></text></corpus>',
+        '<corpus><file audio="x.wav"></file></corpus>',
+        '<corpus><text><file/></text><text><file/></text></corpus>',
+    ]
+)
+def test_get_file_invalid(tmp_path, xml):
+    tmp_path.joinpath('test.xml').write_text(xml, encoding='utf8')
+    with pytest.raises(AssertionError):
+        list(get_file(tmp_path / 'test.xml'))
+
+
+def test_stream_xml(fixtures, tmp_path):
+    src = fixtures / 'data' / '2311' / 'veraa' / 'xml' / 'mc_veraa_isam.xml'
+
+    def transform(unit):
+        for e in unit.xpath('utterance'):
+            e.text = 'teststuff'
+
+    stream_xml(src, tmp_path / 'test.xml', 4, transform=transform, newline='\r\n')
+    assert tmp_path.joinpath('test.xml').read_bytes().count(b'teststuff') == \
+        len(list(get_file(src)))
+    assert len(list(get_file(tmp_path / 'test.xml'))) == len(list(get_file(src)))
+
+    stream_xml(src, tmp_path / 'test.xml', 4, newline='\r\n')
+    assert tmp_path.joinpath('test.xml').read_bytes() == src.read_bytes()
+
+
+@pytest.mark.parametrize(
+    'xml',
+    [
+        # Comments and processing instructions between, before and within units:
+        '<!-- top --><multicast><corpus><!-- c --><text><file f_name="x"><unit id="1"><a>x</a>'
+        '</unit><!-- between --><?pi x?><unit id="2"><a>y</a><!-- in --></unit></file></text>'
+        '</corpus></multicast><!-- after -->',
+        # Indented containers and units:
+        '<multicast>\n  <!-- c -->\n  <corpus>\n    <text>\n      <file f_name="x">\n'
+        '        <unit id="1"><a>x</a></unit>\n        <!-- between -->\n        <unit id="2">\n'
+        '          <a>y</a>\n        </unit>\n      </file>\n    </text>\n  </corpus>\n'
+        '</multicast>',
+        # Childless containers and containers with text:
+        '<multicast><corpus><text><file f_name="x"/></text><text>t<!-- c --></text></corpus>'
+        '</multicast>',
+        # Text after a child of a container:
+        '<multicast><corpus><text><file f_name="x"><unit id="1"/>tail<unit id="2"/></file>'
+        '</text></corpus></multicast>',
+    ]
+)
+def test_stream_xml_serialization(tmp_path, xml):
+    src = tmp_path / 'src.xml'
+    src.write_text('<?xml version="1.0" encoding="UTF-8"?>\n' + xml, encoding='utf8')
+
+    def transform(unit):
+        unit.set('id', unit.get('id') + '0')
+
+    stream_xml(src, tmp_path / 'streamed.xml', 4, transform=transform, newline='\r\n')
+    with updateable_xml(src, newline='\r\n') as d:
+        for unit in d.xpath('.//unit'):
+            transform(unit)
+    assert tmp_path.joinpath('streamed.xml').read_bytes() == src.read_bytes()
+
+
+def test_parse_tiers():
+    unit = fromstring("""<unit><annotations>
+<segment><gword>a</gword><gloss>A</gloss><graid/><!-- c --><gword>x</gword></segment>
+<segment><gword>b</gword><refind>0001</refind></segment>
+</annotations></unit>""")
+    tiers = parse_tiers(unit)
+    assert tiers['gword'] == ['a', 'b']
+    assert tiers['graid'] == [UNMARKED, UNMARKED]
+    assert tiers['refind'] == [UNMARKED, '0001']
+    assert tiers['isnref'] == [UNMARKED, UNMARKED]